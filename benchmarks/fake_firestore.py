@@ -0,0 +1,145 @@
+"""
+In-memory stand-in for the parts of the Firestore client the bot uses.
+
+Supports collection().add/stream/where/document/on_snapshot and batched
+writes. Snapshot listeners are called synchronously on every change.
+"""
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+_ids = itertools.count(1)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, reference):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self):
+        return FakeSnapshot(self.id, self._collection._docs.get(self.id), self)
+
+    def set(self, data):
+        self._collection._write(self.id, dict(data))
+
+    def update(self, data):
+        current = dict(self._collection._docs.get(self.id) or {})
+        current.update(data)
+        self._collection._write(self.id, current)
+
+    def delete(self):
+        self._collection._write(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters):
+        self._collection = collection
+        self._filters = filters
+
+    def where(self, field, op, value):
+        if op != "==":
+            raise NotImplementedError(f"Unsupported operator: {op}")
+        return FakeQuery(self._collection, self._filters + [(field, value)])
+
+    def stream(self):
+        with self._collection._lock:
+            docs = list(self._collection._docs.items())
+        for doc_id, data in docs:
+            if all(data.get(field) == value for field, value in self._filters):
+                yield FakeSnapshot(doc_id, data, FakeDocumentReference(self._collection, doc_id))
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, name):
+        super().__init__(self, [])
+        self.name = name
+        self._docs = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def add(self, data):
+        doc_id = f"doc{next(_ids)}"
+        self._write(doc_id, dict(data))
+        return time.time(), FakeDocumentReference(self, doc_id)
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or f"doc{next(_ids)}")
+
+    def stream(self):
+        for snapshot in super().stream():
+            self.reads += 1
+            yield snapshot
+
+    def on_snapshot(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+            docs = list(self._docs.items())
+        callback(None, [self._change("ADDED", doc_id, data) for doc_id, data in docs], time.time())
+        return SimpleNamespace(unsubscribe=lambda: self._listeners.remove(callback))
+
+    def _change(self, kind, doc_id, data):
+        return SimpleNamespace(
+            type=SimpleNamespace(name=kind),
+            document=FakeSnapshot(doc_id, data, FakeDocumentReference(self, doc_id)),
+        )
+
+    def _write(self, doc_id, data):
+        with self._lock:
+            self.writes += 1
+            existed = doc_id in self._docs
+            if data is None:
+                previous = self._docs.pop(doc_id, None)
+                change = self._change("REMOVED", doc_id, previous) if existed else None
+            else:
+                self._docs[doc_id] = data
+                change = self._change("MODIFIED" if existed else "ADDED", doc_id, data)
+            listeners = list(self._listeners)
+        if change is not None:
+            for callback in listeners:
+                callback(None, [change], time.time())
+
+
+class FakeWriteBatch:
+    def __init__(self):
+        self._ops = []
+
+    def set(self, reference, data):
+        self._ops.append((reference, data))
+
+    def delete(self, reference):
+        self._ops.append((reference, None))
+
+    def commit(self):
+        for reference, data in self._ops:
+            if data is None:
+                reference.delete()
+            else:
+                reference.set(data)
+        self._ops = []
+
+
+class FakeFirestore:
+    def __init__(self):
+        self._collections = {}
+
+    def collection(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def batch(self):
+        return FakeWriteBatch()
@@ -0,0 +1,85 @@
+"""
+Fake Gemini model with configurable latency and canned answers.
+
+It has the same generate_content(prompt, stream=False) method as
+google.generativeai.GenerativeModel. It blocks the calling thread for the
+sampled latency the way the real SDK does, so a blocking call on the event
+loop shows up in the numbers.
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class LatencyDistribution:
+    """
+    Samples call latencies in seconds: 'fixed', 'uniform' or 'lognormal'.
+    """
+
+    def __init__(self, kind="lognormal", mean=0.8, spread=0.4, seed=None):
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self.kind == "fixed":
+                return self.mean
+            if self.kind == "uniform":
+                return max(0.0, self._random.uniform(self.mean - self.spread, self.mean + self.spread))
+            # Median at `mean` with a long right tail
+            return self._random.lognormvariate(0, self.spread) * self.mean
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    model_name = "models/fake-gemini"
+
+    def __init__(self, latency=None, chunks=5):
+        self.latency = latency or LatencyDistribution()
+        self.chunks = chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        delay = self.latency.sample()
+        text = self.answer(prompt)
+        if not stream:
+            time.sleep(delay)
+            return _Chunk(text)
+        return self._stream(text, delay)
+
+    def _stream(self, text, delay):
+        size = max(1, len(text) // self.chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            yield _Chunk(piece)
+
+    @staticmethod
+    def answer(prompt):
+        """
+        Return a canned answer shaped like what each call site expects.
+        """
+        if "Classify the following birthday request" in prompt:
+            return json.dumps({"intent": "list", "name": None, "birthdate": None})
+        if "Extract the time, date, and content" in prompt:
+            when = datetime.now() + timedelta(hours=1)
+            return json.dumps({
+                "time": when.strftime("%I:%M %p"),
+                "date": when.strftime("%Y-%m-%d"),
+                "content": "benchmark reminder",
+            })
+        if "Update the summary of a conversation" in prompt:
+            return "The user and the assistant exchanged benchmark messages."
+        return "This is a canned benchmark answer. " * 8
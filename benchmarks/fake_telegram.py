@@ -0,0 +1,190 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+Serves the methods the bot uses (getMe, getUpdates, sendMessage,
+sendAnimation, editMessageText, ...) over plain HTTP so the real
+python-telegram-bot stack can run against it. Point the bot at it with
+`base_url=f"http://127.0.0.1:{port}/bot"`.
+"""
+import asyncio
+import itertools
+import json
+import time
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "BenchBot", "username": "bench_bot"}
+
+
+class FakeTelegramServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.updates = []
+        self.sent = []
+        self.webhook_url = None
+        self._server = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self._waiters = {}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    # -- Driver side --------------------------------------------------------
+
+    def make_update(self, chat_id, text):
+        update_id = next(self._update_ids)
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+                "text": text,
+            },
+        }
+
+    async def push_update(self, update):
+        """
+        Queue an update for the next getUpdates call.
+        """
+        async with self._new_update:
+            self.updates.append(update)
+            self._new_update.notify_all()
+
+    def expect_reply(self, chat_id):
+        """
+        Return a future resolved with the time of the next bot message to the chat.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(chat_id, []).append(future)
+        return future
+
+    # -- Bot API side -------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                status, payload = await self._dispatch(path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_params(headers, body):
+        if not body:
+            return {}
+        if headers.get("content-type", "").startswith("application/json"):
+            return json.loads(body)
+        params = {}
+        for key, value in parse_qsl(body.decode()):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def _dispatch(self, path, headers, body):
+        api_method = path.rsplit("/", 1)[-1]
+        params = self._parse_params(headers, body)
+        handler = getattr(self, f"api_{api_method}", None)
+        if handler is None:
+            return 404, {"ok": False, "error_code": 404, "description": f"Not Found: {api_method}"}
+        return 200, {"ok": True, "result": await handler(params)}
+
+    async def api_getMe(self, params):
+        return BOT_USER
+
+    async def api_deleteWebhook(self, params):
+        self.webhook_url = None
+        return True
+
+    async def api_setWebhook(self, params):
+        self.webhook_url = params.get("url")
+        return True
+
+    async def api_getUpdates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        async with self._new_update:
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return list(self.updates)
+
+    def _record(self, method, chat_id, text):
+        now = time.perf_counter()
+        self.sent.append((method, chat_id, now, text))
+        waiters = self._waiters.get(chat_id)
+        if waiters:
+            future = waiters.pop(0)
+            if not future.done():
+                future.set_result(now)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    async def api_sendMessage(self, params):
+        return self._record("sendMessage", int(params["chat_id"]), params.get("text", ""))
+
+    async def api_sendAnimation(self, params):
+        message = self._record("sendAnimation", int(params["chat_id"]), params.get("caption", ""))
+        message["animation"] = {
+            "file_id": "bench-animation", "file_unique_id": "bench-animation",
+            "width": 1, "height": 1, "duration": 1,
+        }
+        return message
+
+    async def api_editMessageText(self, params):
+        chat_id = int(params["chat_id"])
+        self.sent.append(("editMessageText", chat_id, time.perf_counter(), params.get("text", "")))
+        return {
+            "message_id": int(params.get("message_id") or 0),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    async def api_answerCallbackQuery(self, params):
+        return True
@@ -0,0 +1,187 @@
+"""
+End-to-end load benchmark for the bot.
+
+Runs the real handlers from main.py against a local stand-in Telegram Bot
+API, a fake Gemini backend and an in-memory Firestore. N simulated users
+send messages concurrently across the reminder, time, birthday and chat
+routes. The report shows throughput and p50/p95/p99 latency per route,
+measured from the moment an update is handed to the bot until the bot's
+first message back to that chat.
+
+    python -m benchmarks.load --users 50 --messages 10 --llm-mean 0.8
+    python -m benchmarks.load --mode webhook --concurrent-updates 64
+    python -m benchmarks.load --store sqlite
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import secrets
+import tempfile
+import time
+import httpx
+from benchmarks.fake_firestore import FakeFirestore
+from benchmarks.fake_gemini import FakeGeminiModel, LatencyDistribution
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.webhook_harness import SECRET_HEADER, percentile
+
+ROUTE_MESSAGES = {
+    "reminder": [
+        "remind me to stretch in 30 minutes",
+        "remind me to call mom tomorrow at 5pm",
+        "remind me about the report whenever the meeting ends",
+    ],
+    "time": ["what's the time", "current time please"],
+    "birthday": [
+        "show all birthdays",
+        "save the birthday of Alex on 20th December",
+        "which birthdays are coming up?",
+    ],
+    "chat": ["tell me a joke", "explain recursion briefly", "how do plants make food?"],
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route not in ROUTE_MESSAGES:
+            raise argparse.ArgumentTypeError(f"unknown route: {route}")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+async def run_user(server, deliver, chat_id, messages, mix, rng, results, reply_timeout):
+    routes = list(mix)
+    weights = [mix[r] for r in routes]
+    for _ in range(messages):
+        route = rng.choices(routes, weights)[0]
+        update = server.make_update(chat_id, rng.choice(ROUTE_MESSAGES[route]))
+        reply = server.expect_reply(chat_id)
+        started = time.perf_counter()
+        await deliver(update)
+        try:
+            replied_at = await asyncio.wait_for(reply, reply_timeout)
+            results.setdefault(route, []).append(replied_at - started)
+        except asyncio.TimeoutError:
+            results.setdefault(f"{route} (timed out)", []).append(reply_timeout)
+
+
+async def run(args):
+    server = await FakeTelegramServer().start()
+
+    # Configure the bot before its modules read the environment
+    os.environ["CONCURRENT_UPDATES"] = str(args.concurrent_updates)
+    os.environ["CHAT_DEBOUNCE"] = str(args.chat_debounce)
+    reminders_db = os.path.join(tempfile.mkdtemp(prefix="bench-"), "reminders.db")
+    # Keep the fake server's file_ids out of the real media cache
+    os.environ["MEDIA_CACHE_PATH"] = os.path.join(os.path.dirname(reminders_db), "media.db")
+
+    from bot import TelegramBot
+    from main import setup
+    from utils.llm import llm_gateway
+    from utils.outbound import outbound
+    from utils.lanes import lanes
+    from utils.birthday_store import create_birthday_store
+
+    llm_gateway.model = FakeGeminiModel(
+        LatencyDistribution(args.latency, args.llm_mean, args.llm_spread, seed=args.seed)
+    )
+    if not args.cache:
+        llm_gateway.cache = None
+
+    bot = TelegramBot(token="123456:BENCHMARK", base_url=server.base_url)
+    if args.store == "firestore":
+        router = setup(bot, db=FakeFirestore(), reminders_db=reminders_db)
+    else:
+        store = create_birthday_store(args.store, path=os.path.join(os.path.dirname(reminders_db), "birthdays.db"))
+        router = setup(bot, reminders_db=reminders_db, birthday_store=store)
+    application = bot.application
+
+    await application.initialize()
+    client = None
+    if args.mode == "webhook":
+        secret = secrets.token_urlsafe(16)
+        url = f"http://127.0.0.1:{args.webhook_port}/telegram"
+        await application.updater.start_webhook(
+            listen="127.0.0.1", port=args.webhook_port, url_path="telegram",
+            webhook_url=url, secret_token=secret,
+        )
+        client = httpx.AsyncClient(timeout=30)
+
+        async def deliver(update):
+            await client.post(url, content=json.dumps(update),
+                              headers={"Content-Type": "application/json", SECRET_HEADER: secret})
+    else:
+        await application.updater.start_polling(poll_interval=0.0, timeout=1)
+        deliver = server.push_update
+    await application.start()
+
+    rng = random.Random(args.seed)
+    results = {}
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            run_user(server, deliver, 10_000 + user, args.messages, args.mix,
+                     random.Random(rng.random()), results, args.reply_timeout)
+            for user in range(args.users)
+        ))
+    finally:
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        if client is not None:
+            await client.aclose()
+        await server.stop()
+
+    total = sum(len(v) for v in results.values())
+    print(f"mode={args.mode} users={args.users} messages/user={args.messages} "
+          f"concurrent_updates={args.concurrent_updates} chat_debounce={args.chat_debounce} "
+          f"llm={args.latency}({args.llm_mean}s)")
+    print(f"{total} messages in {elapsed:.2f}s -> {total / elapsed:.1f} msg/s")
+    print(f"{'route':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route in sorted(results):
+        values = results[route]
+        print(f"{route:<24}{len(values):>7}"
+              f"{percentile(values, 0.50) * 1000:>10.0f}"
+              f"{percentile(values, 0.95) * 1000:>10.0f}"
+              f"{percentile(values, 0.99) * 1000:>10.0f}")
+    print(f"router: {router.stats}")
+    print(f"llm: {llm_gateway.stats()}")
+    print(f"outbound: {outbound.stats()}")
+    print(f"lanes: {lanes.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=10, help="messages per user")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("reminder,time,birthday,chat"),
+                        help="route weights, e.g. reminder=1,time=2,birthday=1,chat=4")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--webhook-port", type=int, default=8899)
+    parser.add_argument("--store", choices=("firestore", "sqlite", "memory"), default="firestore",
+                        help="birthday store; 'firestore' uses the in-memory Firestore fake")
+    parser.add_argument("--concurrent-updates", type=int, default=64)
+    # Each simulated user sends its next message as soon as the previous one is
+    # answered, so with a burst window it would join the previous burst and never
+    # get a reply of its own
+    parser.add_argument("--chat-debounce", type=float, default=0.0,
+                        help="CHAT_DEBOUNCE for the run; 0 answers every chat message separately")
+    parser.add_argument("--latency", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--llm-mean", type=float, default=0.8, help="median Gemini latency in seconds")
+    parser.add_argument("--llm-spread", type=float, default=0.4)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--reply-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
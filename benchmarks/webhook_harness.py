@@ -0,0 +1,103 @@
+"""
+POST synthetic Telegram updates to a bot running in webhook mode and report
+how quickly they are acknowledged.
+
+    BOT_MODE=webhook WEBHOOK_SECRET=s3cret WEBHOOK_PORT=8443 python main.py
+    python -m benchmarks.webhook_harness --url http://127.0.0.1:8443/telegram --secret s3cret
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import httpx
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+_update_ids = itertools.count(1)
+
+
+def make_update(chat_id, text):
+    """
+    Build a minimal Telegram text-message update.
+    """
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+            "text": text,
+        },
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def post_updates(url, secret, count, concurrency, chats, text):
+    """
+    POST `count` updates with at most `concurrency` in flight and return the ack latencies.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def post_one(i):
+            nonlocal failures
+            body = json.dumps(make_update(1000 + i % chats, text))
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    url, content=body,
+                    headers={"Content-Type": "application/json", SECRET_HEADER: secret},
+                )
+                elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post_one(i) for i in range(count)))
+        total = time.perf_counter() - started
+
+        # The listener must reject updates that carry the wrong secret
+        rejected = await client.post(
+            url, content=json.dumps(make_update(1, text)),
+            headers={"Content-Type": "application/json", SECRET_HEADER: secret + "-wrong"},
+        )
+
+    return latencies, failures, total, rejected.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--text", default="what's the time")
+    args = parser.parse_args()
+
+    latencies, failures, total, rejected_status = asyncio.run(
+        post_updates(args.url, args.secret, args.count, args.concurrency, args.chats, args.text)
+    )
+    print(f"acknowledged: {len(latencies)}/{args.count} ({failures} failed) in {total:.2f}s "
+          f"-> {len(latencies) / total if total else 0:.1f} updates/s")
+    print(f"ack latency: p50={percentile(latencies, 0.50) * 1000:.1f}ms "
+          f"p95={percentile(latencies, 0.95) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.1f}ms")
+    print(f"wrong secret -> HTTP {rejected_status} (expected 403)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
+import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from utils.config import TELEGRAM_TOKEN
+import secrets
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
+from utils.config import (
+    TELEGRAM_TOKEN, TELEGRAM_BASE_URL, BOT_MODE, CONCURRENT_UPDATES,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+)
 
 # Enable logging
 logging.basicConfig(
@@ -11,18 +17,88 @@ logger = logging.getLogger(__name__)
 class TelegramBot:
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, token=TELEGRAM_TOKEN, base_url=TELEGRAM_BASE_URL):
         if cls._instance is None:
             cls._instance = super(TelegramBot, cls).__new__(cls)
-            cls._instance.application = Application.builder().token(TELEGRAM_TOKEN).build()
+            builder = Application.builder().token(token).concurrent_updates(CONCURRENT_UPDATES)
+            if base_url:
+                builder = builder.base_url(base_url)
+            cls._instance.application = builder.build()
         return cls._instance
 
     def add_handler(self, handler):
         self._instance.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handler))
 
+    def add_callback_handler(self, handler, pattern=None):
+        self._instance.application.add_handler(CallbackQueryHandler(handler, pattern=pattern))
+
+    def add_command_handler(self, command, handler):
+        self._instance.application.add_handler(CommandHandler(command, handler))
+
+    def add_document_handler(self, handler, extensions):
+        document_filter = filters.Document.FileExtension(extensions[0])
+        for extension in extensions[1:]:
+            document_filter |= filters.Document.FileExtension(extension)
+        # Imports download and write whole files; run them as tasks so they
+        # don't hold up the processing of other updates
+        self._instance.application.add_handler(MessageHandler(document_filter, handler, block=False))
+
+    def add_update_forwarder(self, handler):
+        # Receives every update, whatever its type
+        self._instance.application.add_handler(TypeHandler(Update, handler))
+
+    @property
+    def job_queue(self):
+        return self._instance.application.job_queue
+
     def schedule_task(self, callback, interval, first=0):
         job_queue = self._instance.application.job_queue
         job_queue.run_repeating(callback, interval=interval, first=first)
 
-    def run(self):
-        self._instance.application.run_polling()
+    def run(self, mode=BOT_MODE):
+        if mode == "webhook":
+            self.run_webhook()
+        else:
+            self._instance.application.run_polling()
+
+    def run_webhook(self, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH,
+                    webhook_url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET):
+        """
+        Serve updates from Telegram over HTTPS POSTs instead of long polling.
+
+        The listener validates the secret token, puts each update on the
+        application's queue and acknowledges it straight away; handlers run
+        asynchronously afterwards.
+        """
+        if not secret_token:
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET is not set, using a random secret for this run")
+        self._instance.application.run_webhook(
+            listen=listen,
+            port=port,
+            url_path=url_path,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+        )
+
+    def serve_queue(self, queue):
+        """
+        Run as a worker: process updates read from a multiprocessing queue
+        instead of polling Telegram. A None item stops the worker.
+        """
+        asyncio.run(self._serve_queue(queue))
+
+    async def _serve_queue(self, queue):
+        application = self._instance.application
+        await application.initialize()
+        await application.start()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await loop.run_in_executor(None, queue.get)
+                if data is None:
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            await application.stop()
+            await application.shutdown()
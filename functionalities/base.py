@@ -1,8 +1,37 @@
+import functools
 from abc import ABC, abstractmethod
 from telegram import Update
 from telegram.ext import ContextTypes
+from utils.metrics import metrics
 
 class Functionality(ABC):
+    # Routing: whole-word keywords, regex patterns (optionally as (regex, priority))
+    # and the priority used when several Functionalities match the same message
+    keywords = ()
+    patterns = ()
+    priority = 0
+    # Update lane: "fast" for handlers that only do local work, "llm" for ones that wait on Gemini
+    lane = "llm"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Time every execute() as handler_seconds{functionality=...}
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "_instrumented", False):
+            @functools.wraps(execute)
+            async def instrumented(self, update, context):
+                with metrics.track("handler", functionality=cls.__name__):
+                    return await execute(self, update, context)
+
+            instrumented._instrumented = True
+            cls.execute = instrumented
+
+    def lane_for(self, text):
+        """
+        Return the lane a message for this Functionality should run in.
+        """
+        return self.lane
+
     @abstractmethod
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         pass
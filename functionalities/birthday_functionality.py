@@ -1,242 +1,451 @@
+import asyncio
+import json
 import logging
 import calendar
+import os
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import MessageLimit
 from telegram.ext import ContextTypes
 from functionalities.base import Functionality
-from utils.firebase import get_firestore_client
-from utils.config import gemini_model
+from utils.config import BIRTHDAY_STORE, BIRTHDAYS_DB
+from utils.llm import llm_gateway
+from utils.outbound import outbound
+from utils.media import media
+from utils.dateparse import parse_birthday, parse_stats
+from utils.birthday_store import create_birthday_store, FIRESTORE_BATCH_LIMIT
+from utils.birthday_index import parse_birthdate
+from utils.birthday_import import ImportResult, import_kind, parse_birthday_file
+from utils.workers import SINGLE
 import tabulate
 
 logger = logging.getLogger(__name__)
 
+BIRTHDAY_INTENTS = ("save", "list", "upcoming", "delete", "unknown")
+UPCOMING_DAYS = 30
+PAGE_SIZE = 10
+PAGE_CALLBACK_PREFIX = "birthdays:"
+# Room left in a message for the title and footer around the table
+PAGE_OVERHEAD = 200
+# Sent after the first page of the listing, by cached file_id once Telegram has fetched it
+CELEBRATION_ANIMATION_URL = "https://media.giphy.com/media/Im6d35ebkCIiGzonjI/giphy.gif"
+# Chats whose rendered listing is kept
+RENDERED_CHATS = 1000
+# Largest birthday file accepted for import (the Bot API serves files up to 20 MB)
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
 
-class BirthdayFunctionality(Functionality):
-    def __init__(self):
-        # Initialize Firestore client
-        self.db = get_firestore_client()
-        self.birthdays = self._load_birthdays()
 
-    def _load_birthdays(self):
+class BirthdayFunctionality(Functionality):
+    keywords = ("birthday", "birthdays", "bday")
+    priority = 30
+
+    def __init__(self, db=None, shard=SINGLE, store=None):
+        # The birthday store (and its Firestore client) is built on first use.
+        # Passing a Firestore-compatible `db` selects the Firestore store.
+        self._db = db
+        self.shard = shard
+        self._rendered = OrderedDict()
+        self._store = store
+        self._store_lock = threading.Lock()
+
+    @property
+    def store(self):
         """
-        Load birthdays from Firestore.
+        The BirthdayRepository chosen by BIRTHDAY_STORE, opened the first time it is needed.
         """
-        birthdays = []
-        try:
-            firestore_birthdays = self.db.collection("birthdays").stream()
-            for doc in firestore_birthdays:
-                birthdays.append(doc.to_dict())
-        except Exception as e:
-            logger.error(f"Error loading birthdays from Firestore: {e}")
-        return birthdays
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    kind = "firestore" if self._db is not None else BIRTHDAY_STORE
+                    store = create_birthday_store(kind, db=self._db, path=BIRTHDAYS_DB)
+                    store.open()
+                    self._store = store
+        return self._store
+
+    def warm_up(self):
+        """
+        Open the birthday store now instead of on the first birthday request.
+        """
+        return self.store
+
+    def lane_for(self, text):
+        # Requests the local parser understands never wait on Gemini
+        return "fast" if parse_birthday(text) else "llm"
 
     async def invoke_gemini(self, prompt):
         """
         Send a prompt to the Gemini API and return the response.
         """
         try:
-            response = gemini_model.generate_content(prompt)
-            return response.text.strip()
+            return await llm_gateway.generate(prompt, cache_namespace="birthday")
         except Exception as e:
             logger.error(f"Error invoking Gemini: {e}")
             return None
 
-    async def checkCondition(self, action):
+    async def parse_birthday_request(self, user_input):
         """
-        Check if the user input suggests a specific action using Gemini.
-        """
-        try:
-            # Explicit prompt for Gemini
-            prompt = (
-                f"Respond only with 'true' or 'false' based on the following input:\n"
-                f"{action}\n"
-                "Rules:\n"
-                "1. Return 'true' if the input clearly suggests the action.\n"
-                "2. Return 'false' if the input does not suggest the action.\n"
-                "3. Do not include any additional text or explanations.\n"
-                "Example:\n"
-                "Input: 'Save the birthday of Akhil on 6th April 2001'\n"
-                "Output: true\n"
-                "Input: 'What's the weather today?'\n"
-                "Output: false"
-                "input: 'Show all birthdays'\n"
-                "Output: true"
-            )
-
-            # Send the prompt to Gemini
-            response = await self.invoke_gemini(prompt)  # Await the response
-            if response is None:
-                return False
-
-            response_text = response.strip().lower()
-
-            # Debugging: Log the response from Gemini
-            logger.info(f"Gemini response for action '{action}': {response_text}")
-
-            # Return True if the response is 'true', otherwise False
-            return response_text == 'true'
-        except Exception as e:
-            logger.error(f"Error checking condition: {e}")
-            return False
+        Use a single Gemini call to extract the intent, name and birthdate from the user's input.
 
-    async def parse_birthday_input(self, user_input):
-        """
-        Use Gemini API to extract name and birthdate from the user's input.
+        Returns a validated dict with keys 'intent', 'name' and 'birthdate', or None
+        if the response could not be understood. Common phrasings are parsed
+        locally and only fall back to Gemini when the local parser is unsure.
         """
+        parsed = parse_birthday(user_input)
+        parse_stats.record("birthday", parsed is not None)
+        if parsed:
+            birthdate = parsed["birthdate"]
+            return self._validate_birthday_request({
+                "intent": parsed["intent"],
+                "name": parsed["name"],
+                "birthdate": birthdate.strftime("%Y-%m-%d") if birthdate else None,
+            })
         try:
             prompt = (
-                f"Extract the name and birthdate from the following text:\n"
+                f"Classify the following birthday request and extract its details:\n"
                 f"'{user_input}'\n"
                 "Rules:\n"
-                "1. The name is the person whose birthday is being mentioned.\n"
-                "2. The birthdate can be in any format (e.g., '20th December', '12/20/2000', 'December 20, 2000', '20-12-2000'). Convert it to 'YYYY-MM-DD' format.\n"
-                "3. If the year is not mentioned, assume the current year.\n"
-                "4. If the user provides a phrase like 'save the birthday of' or 'remember the birthday of', extract the name and birthdate from that context.\n"
+                "1. 'intent' is one of: 'save' (store a birthday), 'list' (show saved birthdays), "
+                "'upcoming' (show birthdays coming up soon), 'delete' (forget a saved birthday), 'unknown'.\n"
+                "2. 'name' is the person whose birthday is being mentioned, or null if there is none.\n"
+                "3. 'birthdate' can be in any format (e.g., '20th December', '12/20/2000', 'December 20, 2000', '20-12-2000'). "
+                "Convert it to 'YYYY-MM-DD' format, or null if there is none.\n"
+                f"4. If the year is not mentioned, assume {datetime.now().year}.\n"
                 "5. If the user provides multiple names or dates, extract the first valid pair.\n"
-                "6. Return the response **only** in JSON format with keys: 'name', 'birthdate'.\n"
+                "6. Return the response **only** in JSON format with keys: 'intent', 'name', 'birthdate'.\n"
                 "Examples:\n"
-                "Input: 'Save the birthday of Aadithya on 20th December'\n"
-                "Output: {{\"name\": \"Aadithya\", \"birthdate\": \"2023-12-20\"}}\n"
-                "Input: 'Remember that John's birthday is on 12/20/2000'\n"
-                "Output: {{\"name\": \"John\", \"birthdate\": \"2000-12-20\"}}\n"
-                "Input: 'Add Sarah's birthday: December 20, 1995'\n"
-                "Output: {{\"name\": \"Sarah\", \"birthdate\": \"1995-12-20\"}}\n"
                 "Input: 'Save the birthday of Alex as 20-12-2000'\n"
-                "Output: {{\"name\": \"Alex\", \"birthdate\": \"2000-12-20\"}}\n"
+                'Output: {"intent": "save", "name": "Alex", "birthdate": "2000-12-20"}\n'
+                "Input: 'Show all birthdays'\n"
+                'Output: {"intent": "list", "name": null, "birthdate": null}\n'
+                "Input: 'Whose birthday is coming up?'\n"
+                'Output: {"intent": "upcoming", "name": null, "birthdate": null}\n'
+                "Input: 'Delete John's birthday'\n"
+                'Output: {"intent": "delete", "name": "John", "birthdate": null}\n'
                 "Ensure the response is always valid JSON and does not contain any additional text."
             )
             response = await self.invoke_gemini(prompt)
             if response is None:
-                return None, None
+                return None
 
             # Extract the JSON part from the response
             start_index = response.find("{")
             end_index = response.rfind("}") + 1
 
-            if start_index == -1 or end_index == -1:
+            if start_index == -1 or end_index == 0:
                 logger.error("No JSON object found in the response.")
-                return None, None
-
-            json_str = response[start_index:end_index]
-
-            # Parse the JSON response
-            import json  # Import json module
-            birthday_data = json.loads(json_str)  # Parse JSON string into a dictionary
-
-            # Extract name and birthdate
-            name = birthday_data.get("name", "")
-            birthdate = birthday_data.get("birthdate", "")
-
-            if birthdate:
-                try:
-                    year, month, day = birthdate.split("-")
-                    month_number = int(month)
-                    month_name = calendar.month_name[month_number]
-                    formatted_birthdate = f"{day}-{month_name}-{year}"
-                    return name, formatted_birthdate
-                except (IndexError, ValueError) as e:
-                    logger.error(f"Error formatting birthdate: {e}")
-                    return None, None
+                return None
+
+            return self._validate_birthday_request(json.loads(response[start_index:end_index]))
         except Exception as e:
-            logger.error(f"Error parsing birthday input: {e}")
-            return None, None
+            logger.error(f"Error parsing birthday request: {e}")
+            return None
+
+    @staticmethod
+    def _validate_birthday_request(data):
+        """
+        Check the extracted request against the expected schema and format the birthdate.
+        """
+        if not isinstance(data, dict):
+            logger.error(f"Birthday request is not a JSON object: {data}")
+            return None
+
+        intent = str(data.get("intent") or "unknown").strip().lower()
+        if intent not in BIRTHDAY_INTENTS:
+            intent = "unknown"
+        name = str(data.get("name") or "").strip() or None
+        birthdate = str(data.get("birthdate") or "").strip() or None
+
+        if birthdate:
+            try:
+                parsed = datetime.strptime(birthdate, "%Y-%m-%d")
+                birthdate = f"{parsed.day:02d}-{calendar.month_name[parsed.month]}-{parsed.year}"
+            except ValueError as e:
+                logger.error(f"Error formatting birthdate: {e}")
+                birthdate = None
+
+        if intent == "save" and (not name or not birthdate):
+            return {"intent": "save", "name": None, "birthdate": None}
+        if intent == "delete" and not name:
+            return {"intent": "delete", "name": None, "birthdate": None}
+        return {"intent": intent, "name": name, "birthdate": birthdate}
 
     async def save_birthday(self, name, birthdate, chat_id):
         """
-        Save the birthday to Firestore.
+        Save the birthday to the birthday store.
         """
         try:
-            self.db.collection("birthdays").add({
+            self.store.add({
                 "name": name,
                 "birthdate": birthdate,
                 "chat_id": chat_id
             })
-            # Reload birthdays after saving
-            self.birthdays = self._load_birthdays()
             return True
         except Exception as e:
-            logger.error(f"Error saving birthday to Firestore: {e}")
+            logger.error(f"Error saving birthday: {e}")
             return False
 
-    async def get_birthdays(self, chat_id):
+    async def get_birthdays(self, chat_id, page=0):
         """
-        Retrieve all birthdays from Firestore and display them as a visually appealing table.
+        Display one page of this chat's birthdays as a visually appealing table.
+
+        Returns the message text and the inline keyboard used to move between pages.
         """
         try:
-            if not self.birthdays:
-                return "🎉 No birthdays found."
-            print(self.birthdays)
-            # Format the birthdays as a table
-            table = tabulate.tabulate(
-                [(b["name"], b["birthdate"]) for b in self.birthdays],
-                headers=["🎈 Name", "📅 Birthdate"],
-                tablefmt="fancy_grid"
-            )
+            if not self.store.listening:
+                self.store.refresh_chat(chat_id)
+            pages = self._rendered_pages(chat_id)
+            if not pages:
+                return "🎉 No birthdays found.", None
+            return pages[max(0, min(page, len(pages) - 1))]
+        except Exception as e:
+            logger.error(f"Error retrieving birthdays: {e}")
+            return "❌ Failed to retrieve birthdays. Please try again.", None
 
-            # Add a birthday-themed image URL
-            image_url = "https://giphy.com/gifs/MickeyMouse-fun-excited-disney-Im6d35ebkCIiGzonjI"
+    def _rendered_pages(self, chat_id):
+        """
+        Return this chat's rendered pages, re-rendering only when its birthdays changed.
+        """
+        version = self.store.version(chat_id)
+        cached = self._rendered.get(chat_id)
+        if cached is not None and cached[0] == version:
+            self._rendered.move_to_end(chat_id)
+            return cached[1]
+        pages = self._render_pages(self.store.for_chat(chat_id))
+        self._rendered[chat_id] = (version, pages)
+        self._rendered.move_to_end(chat_id)
+        while len(self._rendered) > RENDERED_CHATS:
+            self._rendered.popitem(last=False)
+        return pages
+
+    @staticmethod
+    def _render_pages(birthdays):
+        """
+        Render every page of the listing as (message, keyboard) pairs.
 
-            # Combine the table and image into a single message
+        A page holds up to PAGE_SIZE birthdays, or fewer when the table would
+        not fit in one Telegram message.
+        """
+        limit = MessageLimit.MAX_TEXT_LENGTH - PAGE_OVERHEAD
+        tables = []
+        start = 0
+        while start < len(birthdays):
+            size = min(PAGE_SIZE, len(birthdays) - start)
+            while True:
+                # Format the birthdays as a table
+                table = tabulate.tabulate(
+                    [(b["name"], b["birthdate"]) for b in birthdays[start:start + size]],
+                    headers=["🎈 Name", "📅 Birthdate"],
+                    tablefmt="fancy_grid"
+                )
+                if len(table) <= limit or size == 1:
+                    break
+                size -= 1
+            tables.append(table)
+            start += size
+
+        pages = []
+        for page, table in enumerate(tables):
             message = (
-                f"🎉 All Birthdays:\n\n"
+                f"🎉 All Birthdays (page {page + 1}/{len(tables)}):\n\n"
                 f"{table}\n\n"
-                f"🎂 Celebrate with joy! 🎉\n"
-                f"{image_url}"
+                f"🎂 Celebrate with joy! 🎉"
             )
 
-            return message
+            buttons = []
+            if page > 0:
+                buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{PAGE_CALLBACK_PREFIX}{page - 1}"))
+            if page < len(tables) - 1:
+                buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"{PAGE_CALLBACK_PREFIX}{page + 1}"))
+            pages.append((message, InlineKeyboardMarkup([buttons]) if buttons else None))
+        return pages
+
+    async def show_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Handle the next/prev buttons of the birthday listing.
+        """
+        query = update.callback_query
+        await query.answer()
+        try:
+            page = int(query.data[len(PAGE_CALLBACK_PREFIX):])
+        except ValueError:
+            return
+        message, keyboard = await self.get_birthdays(query.message.chat_id, page)
+        await outbound.send(query.message.chat_id, query.edit_message_text, message, reply_markup=keyboard)
+
+    async def delete_birthday(self, name, chat_id):
+        """
+        Delete the birthdays saved under the given name for this chat.
+        """
+        try:
+            doc_ids = self.store.find(chat_id, name)
+            for doc_id in doc_ids:
+                self.store.delete(doc_id)
+            return len(doc_ids)
         except Exception as e:
-            logger.error(f"Error retrieving birthdays: {e}")
-            return "❌ Failed to retrieve birthdays. Please try again."
+            logger.error(f"Error deleting birthday: {e}")
+            return None
+
+    async def get_upcoming_birthdays(self, chat_id, days=UPCOMING_DAYS):
+        """
+        List the birthdays of this chat that fall within the next `days` days.
+        """
+        upcoming = [
+            (day, b["name"])
+            for day, b in self.store.upcoming_in_chat(chat_id, datetime.now().date(), days)
+        ]
+
+        if not upcoming:
+            return f"🎉 No birthdays in the next {days} days."
+        lines = [f"🎂 {name} — {when.strftime('%d %B')}" for when, name in upcoming]
+        return "🎉 Upcoming birthdays:\n\n" + "\n".join(lines)
 
     async def check_upcoming_birthdays(self, context: ContextTypes.DEFAULT_TYPE):
         """
         Check for upcoming birthdays and send reminders 1 day before.
         """
         try:
-            today = datetime.now().date()
-            tomorrow = today + timedelta(days=1)
-
-            for birthday in self.birthdays:
-                if datetime.strptime(birthday["birthdate"], "%Y-%m-%d").date() == tomorrow:
-                    await context.bot.send_message(
-                        chat_id=birthday["chat_id"],
-                        text=f"🎉 Reminder: Tomorrow is {birthday['name']}'s birthday!"
-                    )
+            tomorrow = datetime.now().date() + timedelta(days=1)
+
+            # Fan out concurrently; the outbound dispatcher keeps within Telegram's limits
+            results = await asyncio.gather(*(
+                outbound.send_message(
+                    context.bot,
+                    birthday["chat_id"],
+                    f"🎉 Reminder: Tomorrow is {birthday['name']}'s birthday!"
+                )
+                for birthday in self.store.on(tomorrow)
+                # With several workers, each one notifies only the chats it owns
+                if self.shard.owns(birthday["chat_id"])
+            ), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error sending birthday reminder: {result}")
         except Exception as e:
             logger.error(f"Error checking upcoming birthdays: {e}")
 
-    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_input = update.message.text
+    async def import_birthdays(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Document handler: bulk-import birthdays from an uploaded CSV, vCard or ICS file.
+
+        The file is parsed locally without any Gemini calls, entries already
+        saved for the chat (same name and day) are skipped, and the rest are
+        written in batches (Firestore batched writes on the Firestore store)
+        while a progress message is updated.
+        """
+        document = update.message.document
         chat_id = update.message.chat_id
+        kind = import_kind(document.file_name)
+        if kind is None:
+            await outbound.reply(update.message, "Please send a .csv, .vcf or .ics file to import birthdays.")
+            return
+        if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+            await outbound.reply(update.message, "That file is too large to import. Please split it into smaller files.")
+            return
+
+        progress = await outbound.reply(update.message, f"📥 Importing birthdays from {document.file_name}...")
+        result = ImportResult()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "upload")
+                telegram_file = await context.bot.get_file(document.file_id)
+                await telegram_file.download_to_drive(path)
+
+                seen = {
+                    self._import_key(b["name"], parse_birthdate(b["birthdate"]))
+                    for b in self.store.for_chat(chat_id)
+                    if parse_birthdate(b["birthdate"])
+                }
+                rows = parse_birthday_file(path, kind, result)
+                while True:
+                    # Parse and commit in worker threads so the event loop keeps serving other chats
+                    batch = await asyncio.to_thread(self._next_import_batch, rows, seen, chat_id, result)
+                    if not batch:
+                        break
+                    await asyncio.to_thread(self.store.add_many, batch)
+                    result.imported += len(batch)
+                    await outbound.edit(progress, f"📥 Imported {result.imported} birthdays so far...")
+        except Exception as e:
+            logger.error(f"Error importing birthdays: {e}")
+            await outbound.edit(
+                progress, f"❌ Import stopped after {result.imported} birthdays. Please try again."
+            )
+            return
 
-        # Check if the user wants to save a birthday
-        action_save = f'Does the following input suggest an intention to save a birthday: "{user_input}"'
-        # Check if the user wants to retrieve birthdays
-        action_retrieve = f'Does the following input suggest an intention to retrieve birthday details or show the birthday details: "{user_input}"'
+        await outbound.edit(
+            progress,
+            f"🎉 Imported {result.imported} birthdays from {document.file_name}.\n"
+            f"Skipped {result.duplicates} already saved and {result.invalid} unreadable entries.",
+        )
 
-        # Await the checkCondition method
-        condition_save = await self.checkCondition(action_save) and 'save' in user_input.lower()
-        condition_retrieve = await self.checkCondition(action_retrieve) and 'show' in user_input.lower()
+    @staticmethod
+    def _import_key(name, birthdate):
+        # Imports without a year get the current one, so compare on name and day only
+        return name.strip().lower(), (birthdate.month, birthdate.day)
 
-        if condition_save:
-            # Parse the user's input using Gemini
-            name, birthdate = await self.parse_birthday_input(user_input)
+    def _next_import_batch(self, rows, seen, chat_id, result):
+        """
+        Take up to one Firestore batch of new birthdays from the parsed rows.
+        """
+        batch = []
+        for name, birthdate in rows:
+            key = self._import_key(name, birthdate)
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            # Same '20-December-2000' format as birthdays saved from chat
+            formatted = f"{birthdate.day:02d}-{calendar.month_name[birthdate.month]}-{birthdate.year}"
+            batch.append({"name": name, "birthdate": formatted, "chat_id": chat_id})
+            if len(batch) == FIRESTORE_BATCH_LIMIT:
+                break
+        return batch
 
+    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_input = update.message.text
+        chat_id = update.message.chat_id
+
+        # One Gemini call classifies the request and extracts the name and birthdate
+        request = await self.parse_birthday_request(user_input)
+        intent = request["intent"] if request else "unknown"
+
+        if intent == "save":
+            name, birthdate = request["name"], request["birthdate"]
             if not name or not birthdate:
-                await update.message.reply_text("Sorry, I couldn't understand your input. Please try again.")
+                await outbound.reply(update.message, "Sorry, I couldn't understand your input. Please try again.")
                 return
 
-            # Save the birthday to Firestore
+            # Save the birthday
             if await self.save_birthday(name, birthdate, chat_id):
-                await update.message.reply_text(f"🎉 Birthday saved for {name} on {birthdate}.")
+                await outbound.reply(update.message, f"🎉 Birthday saved for {name} on {birthdate}.")
             else:
-                await update.message.reply_text("Failed to save the birthday. Please try again.")
-
-        elif condition_retrieve:
-            # Retrieve all birthdays and display them as a table
-            table = await self.get_birthdays(chat_id)
-            await update.message.reply_text(table)
+                await outbound.reply(update.message, "Failed to save the birthday. Please try again.")
+
+        elif intent == "list":
+            # Retrieve this chat's birthdays and display the first page as a table
+            message, keyboard = await self.get_birthdays(chat_id)
+            await outbound.reply(update.message, message, reply_markup=keyboard)
+            # The pages were just rendered; only celebrate a non-empty listing
+            if self._rendered.get(chat_id, (None, None))[1]:
+                await media.send(context.bot, chat_id, "animation", CELEBRATION_ANIMATION_URL)
+
+        elif intent == "upcoming":
+            await outbound.reply(update.message, await self.get_upcoming_birthdays(chat_id))
+
+        elif intent == "delete":
+            name = request["name"]
+            if not name:
+                await outbound.reply(update.message, "Please tell me whose birthday to delete.")
+                return
+            deleted = await self.delete_birthday(name, chat_id)
+            if deleted is None:
+                await outbound.reply(update.message, "Failed to delete the birthday. Please try again.")
+            elif deleted:
+                await outbound.reply(update.message, f"🗑️ Deleted the birthday of {name}.")
+            else:
+                await outbound.reply(update.message, f"No saved birthday found for {name}.")
 
         else:
-            await update.message.reply_text("Sorry, I couldn't understand your request. Please try again.")
+            await outbound.reply(update.message, "Sorry, I couldn't understand your request. Please try again.")
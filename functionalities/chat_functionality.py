@@ -1,17 +1,212 @@
+import asyncio
 import logging
+import time
 from functionalities.base import Functionality
 from telegram import Update
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from utils.config import gemini_model
+from utils.config import (
+    CHAT_STREAMING, STREAM_EDIT_INTERVAL, CHAT_DEBOUNCE, CHAT_DEBOUNCE_MAX,
+    CHAT_HISTORY_TURNS, CHAT_TOKEN_BUDGET, CHAT_MAX_CONVERSATIONS,
+)
+from utils.conversation import ConversationStore
+from utils.lanes import lanes, BUSY_TEXT
+from utils.llm import llm_gateway
+from utils.metrics import metrics
+from utils.outbound import outbound
 
 logger = logging.getLogger(__name__)
 
+PLACEHOLDER_TEXT = "💭 ..."
+
+
+class Burst:
+    """
+    Messages from one chat that arrived within the debounce window.
+    """
+
+    __slots__ = ("messages", "arrived", "placeholder")
+
+    def __init__(self, message):
+        self.messages = [message]
+        self.arrived = asyncio.Event()
+        # Reply sent as soon as the first message arrives; the answer streams into it
+        self.placeholder = None
+
+
 class ChatFunctionality(Functionality):
+    def __init__(self):
+        self.conversations = ConversationStore(
+            self.summarize,
+            max_chats=CHAT_MAX_CONVERSATIONS,
+            max_turns=CHAT_HISTORY_TURNS,
+            token_budget=CHAT_TOKEN_BUDGET,
+        )
+        self._bursts = {}
+
+    async def summarize(self, summary, turns):
+        """
+        Fold older turns into the running conversation summary using Gemini.
+        """
+        transcript = "\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in turns)
+        prompt = (
+            f"Update the summary of a conversation with the new exchanges below.\n"
+            f"Keep it under {self.conversations.summary_budget * 3 // 4} words and keep facts the user shared.\n"
+            f"Current summary:\n{summary or '(none)'}\n"
+            f"New exchanges:\n{transcript}\n"
+            "Return only the updated summary."
+        )
+        return await llm_gateway.generate(prompt, site="chat_summary")
+
+    def lane_for(self, text):
+        # With debouncing, execute() only records the message; the reply is queued on the llm lane
+        return "fast" if CHAT_DEBOUNCE > 0 else "llm"
+
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_message = update.message.text
+        if CHAT_DEBOUNCE <= 0:
+            await self.respond(update.message, update.message.text)
+            return
+
+        # Messages sent in quick succession are answered together with one Gemini call
+        chat_id = update.message.chat_id
+        burst = self._bursts.get(chat_id)
+        if burst is not None:
+            burst.messages.append(update.message)
+            burst.arrived.set()
+            metrics.inc("chat_messages_coalesced_total")
+            return
+        burst = self._bursts[chat_id] = Burst(update.message)
+        # Show something straight away instead of after the debounce window
         try:
-            response = gemini_model.generate_content(user_message)
-            await update.message.reply_text(response.text)
+            if CHAT_STREAMING:
+                burst.placeholder = await outbound.reply(update.message, PLACEHOLDER_TEXT)
+            else:
+                await outbound.send(chat_id, context.bot.send_chat_action, chat_id=chat_id, action=ChatAction.TYPING)
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            await update.message.reply_text("Sorry, I couldn't process your message. Please try again.")
+            logger.error(f"Error acknowledging chat message: {e}")
+        # Wait in the background so the chat's next updates can reach this handler
+        context.application.create_task(self._flush_burst(chat_id), update=update)
+
+    async def _flush_burst(self, chat_id):
+        """
+        Wait until the chat has been quiet for CHAT_DEBOUNCE seconds (at most
+        CHAT_DEBOUNCE_MAX in total), then answer the burst as one message.
+        """
+        burst = self._bursts[chat_id]
+        deadline = time.monotonic() + CHAT_DEBOUNCE_MAX
+        try:
+            while True:
+                burst.arrived.clear()
+                remaining = min(CHAT_DEBOUNCE, deadline - time.monotonic())
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(burst.arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            del self._bursts[chat_id]
+
+        # Resent messages are only included once
+        texts = list(dict.fromkeys(m.text for m in burst.messages if m.text))
+        message = burst.messages[-1]
+        if not lanes.submit("llm", chat_id, self.respond, message, "\n".join(texts), burst.placeholder):
+            if burst.placeholder is not None:
+                await self._edit(burst.placeholder, BUSY_TEXT)
+            else:
+                await outbound.reply(message, BUSY_TEXT)
+
+    async def respond(self, message, user_message, placeholder=None):
+        """
+        Answer `user_message` with Gemini, replying to `message` (or streaming
+        into an already sent `placeholder`).
+        """
+        chat_id = message.chat_id
+        prompt = self.conversations.build_prompt(chat_id, user_message)
+
+        if CHAT_STREAMING:
+            response = await self.stream_reply(message, prompt, placeholder)
+        else:
+            try:
+                response = await llm_gateway.generate(prompt, cache_namespace="chat")
+                await outbound.reply(message, response)
+            except Exception as e:
+                logger.error(f"Error generating response: {e}")
+                await outbound.reply(message, "Sorry, I couldn't process your message. Please try again.")
+                response = None
+
+        if response:
+            await self.conversations.add_turn(chat_id, user_message, response)
+
+    async def stream_reply(self, reply_to, prompt, placeholder=None):
+        """
+        Reply with a placeholder straight away (unless `placeholder` was already
+        sent) and edit it as Gemini streams the answer.
+
+        Edits are throttled to one every STREAM_EDIT_INTERVAL seconds. Text past
+        Telegram's message length limit continues in a new message. Returns the
+        full response text, or None if generation failed.
+        """
+        started = time.monotonic()
+        message = placeholder or await outbound.reply(reply_to, PLACEHOLDER_TEXT)
+        text = ""
+        full_text = ""
+        shown = ""
+        last_edit = 0.0
+        first_shown = False
+        try:
+            async for chunk in llm_gateway.stream(prompt, cache_namespace="chat"):
+                text += chunk
+                full_text += chunk
+
+                # Finish the current message and continue in a new one when it is full
+                while len(text) > MessageLimit.MAX_TEXT_LENGTH:
+                    head, text = self._split(text)
+                    await self._edit(message, head)
+                    message = await outbound.reply(reply_to, text or PLACEHOLDER_TEXT)
+                    shown = text
+                    last_edit = time.monotonic()
+
+                if text != shown and time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                    await self._edit(message, text)
+                    shown = text
+                    last_edit = time.monotonic()
+
+                if last_edit and not first_shown:
+                    # Time from the request until the user sees the start of the answer
+                    first_shown = True
+                    metrics.observe("chat_first_token_seconds", last_edit - started)
+
+            if not full_text.strip():
+                await self._edit(message, "Sorry, I couldn't process your message. Please try again.")
+                return None
+            text = text.strip()
+            if text and text != shown:
+                await self._edit(message, text)
+            return full_text.strip()
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            await self._edit(message, (text.strip() + "\n\n" if text.strip() else "")
+                             + "Sorry, I couldn't process your message. Please try again.")
+            return None
+
+    @staticmethod
+    def _split(text):
+        """
+        Split off the longest prefix that fits in one message, preferring a line break.
+        """
+        limit = MessageLimit.MAX_TEXT_LENGTH
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        return text[:cut], text[cut:].lstrip("\n")
+
+    @staticmethod
+    async def _edit(message, text):
+        try:
+            await outbound.edit(message, text)
+        except BadRequest as e:
+            # Telegram rejects edits that do not change the text
+            if "not modified" not in str(e).lower():
+                raise
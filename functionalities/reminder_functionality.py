@@ -1,31 +1,117 @@
-import asyncio
 import json
 import logging
+import re
 from datetime import datetime
 from telegram import Update
+from telegram.error import BadRequest, Forbidden
 from telegram.ext import ContextTypes
 from functionalities.base import Functionality
-from utils.config import gemini_model
+from utils.config import REMINDERS_DB
+from utils.llm import llm_gateway
+from utils.outbound import outbound
+from utils.dateparse import parse_reminder, parse_stats
+from utils.scheduler import ReminderScheduler
+from utils.recurrence import parse_recurrence, next_fire, describe
+from utils.workers import SINGLE
 
 logger = logging.getLogger(__name__)
 
+LIST_REQUEST = re.compile(r"\b(?:show|list|view|see|what are)\b.*\breminders?\b|^\s*(?:my\s+)?reminders\s*\??\s*$", re.I)
+CANCEL_REQUEST = re.compile(r"\b(?:cancel|delete|remove|stop)\b.*?\breminder\s*#?\s*(?P<id>\d+)\b", re.I)
+
 class ReminderFunctionality(Functionality):
-    def __init__(self):
-        self.reminders = {}
-
-    async def set_reminder(self, chat_id, reminder_time, reminder_text, context):
-        now = datetime.now()
-        delay = (reminder_time - now).total_seconds()
-        if delay > 0:
-            await asyncio.sleep(delay)
-            await self.send_reminder(chat_id, reminder_text, context)
-        else:
+    keywords = ("remind", "reminder", "reminders")
+    patterns = ((r"^\s*(?:please\s+)?(?:remind\s+me|set\s+an?\s+reminder)\b", 40),)
+    priority = 20
+
+    def __init__(self, reminders_db=REMINDERS_DB, shard=SINGLE):
+        self.scheduler = ReminderScheduler(
+            reminders_db, self._fire_reminder, shard=shard, is_permanent=self._undeliverable
+        )
+        # Pending reminders by id, shared with the scheduler
+        self.reminders = self.scheduler.entries
+
+    def lane_for(self, text):
+        # Only reminders the local parser cannot read wait on Gemini
+        if CANCEL_REQUEST.search(text) or LIST_REQUEST.search(text) or parse_recurrence(text) or parse_reminder(text):
+            return "fast"
+        return "llm"
+
+    def start(self, job_queue):
+        """
+        Reload persisted reminders and start firing them from the bot's JobQueue.
+        """
+        self.scheduler.start(job_queue)
+
+    def set_reminder(self, chat_id, reminder_time, reminder_text, rule=None):
+        if reminder_time <= datetime.now():
             logger.warning("Reminder time is in the past.")
+            return None
+        return self.scheduler.add(chat_id, reminder_time, reminder_text, rule)
+
+    def list_reminders(self, chat_id):
+        """
+        Describe the chat's pending reminders, soonest first.
+        """
+        reminders = self.scheduler.for_chat(chat_id)
+        if not reminders:
+            return "You have no pending reminders."
+        lines = []
+        for reminder in reminders:
+            when = datetime.fromtimestamp(reminder.fire_at).strftime("%Y-%m-%d %I:%M %p")
+            repeat = f" ({describe(reminder.rule)})" if reminder.rule else ""
+            lines.append(f"#{reminder.id} {when}{repeat}: {reminder.text}")
+        return "⏰ Your reminders:\n\n" + "\n".join(lines) + "\n\nCancel one with /cancel <number>."
+
+    def cancel_reminder(self, chat_id, reminder_id):
+        """
+        Cancel one of the chat's reminders. Returns False if it has no such reminder.
+        """
+        reminder = self.reminders.get(reminder_id)
+        if reminder is None or reminder.chat_id != chat_id:
+            return False
+        return self.scheduler.cancel(reminder_id)
+
+    async def list_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /reminders: list the chat's pending reminders.
+        """
+        await outbound.reply(update.message, self.list_reminders(update.message.chat_id))
+
+    async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /cancel <number>: cancel one of the chat's reminders.
+        """
+        if not context.args or not context.args[0].lstrip("#").isdigit():
+            await outbound.reply(update.message, "Usage: /cancel <number>. See /reminders for the numbers.")
+            return
+        await self._reply_cancel(update, int(context.args[0].lstrip("#")))
+
+    async def _reply_cancel(self, update, reminder_id):
+        if self.cancel_reminder(update.message.chat_id, reminder_id):
+            await outbound.reply(update.message, f"🗑️ Cancelled reminder #{reminder_id}.")
+        else:
+            await outbound.reply(update.message, f"No pending reminder #{reminder_id} found.")
+
+    @staticmethod
+    def _undeliverable(error):
+        # The bot was blocked or removed, or the chat no longer exists
+        return isinstance(error, Forbidden) or (
+            isinstance(error, BadRequest) and "chat not found" in str(error).lower()
+        )
+
+    async def _fire_reminder(self, reminder, context):
+        await self.send_reminder(reminder.chat_id, reminder.text, context)
 
     async def send_reminder(self, chat_id, reminder_text, context):
-        await context.bot.send_message(chat_id=chat_id, text=f"⏰ Reminder: {reminder_text}")
+        await outbound.send_message(context.bot, chat_id, f"⏰ Reminder: {reminder_text}")
 
     async def parse_reminder_input(self, user_input):
+        # Common phrasings are parsed locally; only fall back to Gemini when unsure
+        parsed = parse_reminder(user_input)
+        parse_stats.record("reminder", parsed is not None)
+        if parsed:
+            return parsed
         try:
             prompt = (
                 f"Extract the time, date, and content for a reminder from the following text:\n"
@@ -39,8 +125,7 @@ class ReminderFunctionality(Functionality):
                 "Example output: {{\"time\": \"12:19 AM\", \"date\": \"2024-12-27\", \"content\": \"Eat food\"}}\n"
                 "Do not include any additional text or explanations. Only return valid JSON."
             )
-            response = gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = await llm_gateway.generate(prompt, cache_namespace="reminder")
             logger.info(f"Raw response from Gemini: {response_text}")
             reminder_data = json.loads(response_text)
             time_str = reminder_data.get("time", "")
@@ -58,11 +143,37 @@ class ReminderFunctionality(Functionality):
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_input = update.message.text
         if not user_input:
-            await update.message.reply_text("Please provide a reminder.")
+            await outbound.reply(update.message, "Please provide a reminder.")
+            return
+        cancel = CANCEL_REQUEST.search(user_input)
+        if cancel:
+            await self._reply_cancel(update, int(cancel.group("id")))
+            return
+        if LIST_REQUEST.search(user_input):
+            await outbound.reply(update.message, self.list_reminders(update.message.chat_id))
             return
+
+        # Recurring reminders are parsed locally into a rule; only the next occurrence is stored
+        recurring = parse_recurrence(user_input)
+        if recurring:
+            rule, reminder_text = recurring
+            reminder_time = next_fire(rule, datetime.now())
+            if reminder_time is None:
+                await outbound.reply(update.message, "That schedule never comes up. Please check the dates.")
+                return
+            self.set_reminder(update.message.chat_id, reminder_time, reminder_text, rule)
+            await outbound.reply(
+                update.message,
+                f"Recurring reminder set {describe(rule)}, next on "
+                f"{reminder_time.strftime('%Y-%m-%d %I:%M %p')}: {reminder_text}",
+            )
+            return
+
         reminder_time, reminder_text = await self.parse_reminder_input(user_input)
         if not reminder_time or not reminder_text:
-            await update.message.reply_text("Sorry, I couldn't understand your reminder. Please try again.")
+            await outbound.reply(update.message, "Sorry, I couldn't understand your reminder. Please try again.")
+            return
+        if not self.set_reminder(update.message.chat_id, reminder_time, reminder_text):
+            await outbound.reply(update.message, "That time has already passed. Please choose a time in the future.")
             return
-        asyncio.create_task(self.set_reminder(update.message.chat_id, reminder_time, reminder_text, context))
-        await update.message.reply_text(f"Reminder set for {reminder_time.strftime('%Y-%m-%d %I:%M %p')}: {reminder_text}")
+        await outbound.reply(update.message, f"Reminder set for {reminder_time.strftime('%Y-%m-%d %I:%M %p')}: {reminder_text}")
@@ -5,22 +5,31 @@ from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
 from functionalities.base import Functionality
-from utils.config import gemini_model
+from utils.media import media
+
+CLOCK_ANIMATION_URL = "https://media.giphy.com/media/3o7abKhOpu0NwenH3O/giphy.gif"
 
 class TimeFunctionality(Functionality):
+    keywords = ("time", "clock")
+    patterns = (r"\bwhat'?s\s+the\s+time\b", r"\bcurrent\s+time\b")
+    priority = 10
+    lane = "fast"
+
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         current_time = datetime.now().strftime("%I:%M %p")
         current_date = datetime.now().strftime("%Y-%m-%d")
-        animated_image_url = "https://media.giphy.com/media/3o7abKhOpu0NwenH3O/giphy.gif"
         formatted_text = (
             "*🕒 Time*\n"
             f"`{current_time}`\n\n"
             "*📅 Date*\n"
             f"`{current_date}`"
         )
-        await context.bot.send_animation(
-            chat_id=update.message.chat_id,
-            animation=animated_image_url,
+        # Sent by cached file_id after the first time, so Telegram does not re-fetch the GIF
+        await media.send(
+            context.bot,
+            update.message.chat_id,
+            "animation",
+            CLOCK_ANIMATION_URL,
             caption=formatted_text,
             parse_mode="MarkdownV2"
         )
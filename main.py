@@ -1,43 +1,61 @@
-from bot import TelegramBot
-from functionalities.reminder_functionality import ReminderFunctionality
-from functionalities.time_functionality import TimeFunctionality
-from functionalities.chat_functionality import ChatFunctionality
-from functionalities.birthday_functionality import BirthdayFunctionality
-from utils.config import FIREBASE_SERVICE_ACCOUNT_KEY
+from utils.startup import startup
+
+with startup.timed("import", "bot"):
+    from bot import TelegramBot
+with startup.timed("import", "reminder"):
+    from functionalities.reminder_functionality import ReminderFunctionality
+with startup.timed("import", "time"):
+    from functionalities.time_functionality import TimeFunctionality
+with startup.timed("import", "chat"):
+    from functionalities.chat_functionality import ChatFunctionality
+with startup.timed("import", "birthday"):
+    from functionalities.birthday_functionality import BirthdayFunctionality
+from utils.config import (
+    FIREBASE_SERVICE_ACCOUNT_KEY, REMINDERS_DB, WORKERS,
+    METRICS_LISTEN, METRICS_PORT, METRICS_LOG_INTERVAL,
+)
 from utils.firebase import initialize_firebase
+from utils.llm import llm_gateway
+from utils.metrics import metrics, MetricsServer
+from utils.router import IntentRouter
+from utils.workers import SINGLE, WorkerPool
 
-def main():
-    # Initialize Firebase
-    initialize_firebase(FIREBASE_SERVICE_ACCOUNT_KEY)
+def setup(bot, db=None, reminders_db=REMINDERS_DB, shard=SINGLE, birthday_store=None):
+    """
+    Create the functionalities and register their handlers and jobs on the bot.
 
-    # Create the bot instance
-    bot = TelegramBot()
+    `db`, `birthday_store` and `reminders_db` let benchmarks run against
+    in-process fakes or local stores;
+    `shard` is the slice of chats owned by this worker process.
+    """
+    # Create functionalities; Gemini and Firestore are only touched on first use
+    with startup.timed("init", "ReminderFunctionality"):
+        reminder_func = ReminderFunctionality(reminders_db, shard)
+    with startup.timed("init", "TimeFunctionality"):
+        time_func = TimeFunctionality()
+    with startup.timed("init", "ChatFunctionality"):
+        chat_func = ChatFunctionality()
+    with startup.timed("init", "BirthdayFunctionality"):
+        birthday_func = BirthdayFunctionality(db, shard, birthday_store)
 
-    # Create functionalities
-    reminder_func = ReminderFunctionality()
-    time_func = TimeFunctionality()
-    chat_func = ChatFunctionality()
-    birthday_func = BirthdayFunctionality()
-
-    # Message handler to decide which functionality to execute
-    async def handle_message(update, context):
-        user_input = update.message.text.lower()  # Convert input to lowercase for easier matching
-
-        # Check if the input contains "remind" or "reminder"
-        if "remind" in user_input or "reminder" in user_input:
-            await reminder_func.execute(update, context)
-        # Check if the input is asking for the current time
-        elif "time" in user_input or "what's the time" in user_input or "current time" in user_input:
-            await time_func.execute(update, context)
-        # Check if the input is related to birthdays
-        elif "birthday" in user_input or "birthdays" in user_input:
-            await birthday_func.execute(update, context)
-        # Default to chat functionality
-        else:
-            await chat_func.execute(update, context)
+    # Route each message to the Functionality whose keywords or patterns match
+    router = IntentRouter(default=chat_func)
+    router.register(reminder_func)
+    router.register(time_func)
+    router.register(birthday_func)
 
     # Add message handler
-    bot.add_handler(handle_message)
+    bot.add_handler(router.dispatch)
+
+    # List and cancel pending reminders
+    bot.add_command_handler("reminders", reminder_func.list_command)
+    bot.add_command_handler("cancel", reminder_func.cancel_command)
+
+    # Bulk-import birthdays from uploaded CSV, vCard and ICS files
+    bot.add_document_handler(birthday_func.import_birthdays, ["csv", "vcf", "vcard", "ics"])
+
+    # Add the next/prev buttons of the birthday listing
+    bot.add_callback_handler(birthday_func.show_page, pattern=r"^birthdays:\d+$")
 
     # Schedule the birthday reminder task
     bot.schedule_task(
@@ -46,6 +64,57 @@ def main():
         first=10  # Start after 10 seconds
     )
 
+    # Reload pending reminders and arm the reminder timer
+    with startup.timed("init", "ReminderScheduler"):
+        reminder_func.start(bot.job_queue)
+
+    # Build the Gemini client and the birthday cache in the background once the bot is serving
+    bot.job_queue.run_once(startup.warm_up_job([
+        ("gemini", llm_gateway.warm_up),
+        ("birthdays", birthday_func.warm_up),
+    ]), when=0)
+
+    # Expose handler, Gemini and Firestore metrics and log a periodic summary
+    if METRICS_PORT:
+        # Each worker serves its own metrics on the next port up
+        port = METRICS_PORT + shard.index
+        bot.job_queue.run_once(MetricsServer(metrics, METRICS_LISTEN, port).start, when=0)
+    if METRICS_LOG_INTERVAL:
+        bot.schedule_task(metrics.log_summary, interval=METRICS_LOG_INTERVAL, first=METRICS_LOG_INTERVAL)
+    return router
+
+
+def run_worker(shard, queue):
+    """
+    Entry point of a worker process: run the handlers for the chats in `shard`.
+    """
+    initialize_firebase(FIREBASE_SERVICE_ACCOUNT_KEY)
+    bot = TelegramBot()
+    setup(bot, shard=shard)
+    bot.serve_queue(queue)
+
+
+def main():
+    if WORKERS > 1:
+        # This process only receives updates and hands each one to its chat's worker
+        pool = WorkerPool(WORKERS, run_worker)
+        pool.start()
+        bot = TelegramBot()
+        bot.add_update_forwarder(pool.forward)
+        try:
+            bot.run()
+        finally:
+            pool.stop()
+        return
+
+    # Initialize Firebase
+    initialize_firebase(FIREBASE_SERVICE_ACCOUNT_KEY)
+
+    # Create the bot instance
+    with startup.timed("init", "TelegramBot"):
+        bot = TelegramBot()
+    setup(bot)
+
     # Run the bot
     bot.run()
 
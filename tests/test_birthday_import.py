@@ -0,0 +1,49 @@
+from datetime import date, datetime
+from utils.birthday_import import ImportResult, parse_birthdate, parse_csv, parse_ics, parse_vcard
+
+
+def test_ics_skips_events_that_are_not_birthdays():
+    lines = [
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT", "SUMMARY:Alex's birthday", "DTSTART;VALUE=DATE:19900115", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:Team meeting", "DTSTART:20240301T090000Z", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:Happy Birthday", "DTSTART;VALUE=DATE:20240301", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:Birthday party planning", "DTSTART;VALUE=DATE:20240302", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:bday reminder for team", "DTSTART;VALUE=DATE:20240303", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:Birthday of Sam", "DTSTART;VALUE=DATE:20000503", "END:VEVENT",
+        "BEGIN:VEVENT", "SUMMARY:Kim - Birthday", "DTSTART;VALUE=DATE:19851120", "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+    result = ImportResult()
+
+    assert list(parse_ics(lines, result)) == [
+        ("Alex", date(1990, 1, 15)),
+        ("Sam", date(2000, 5, 3)),
+        ("Kim", date(1985, 11, 20)),
+    ]
+    assert result.invalid == 4
+
+
+def test_headerless_csv_keeps_the_first_rows_case():
+    result = ImportResult()
+
+    rows = list(parse_csv(["Alex,1990-01-15\n", "Sam,2000-05-03\n"], result))
+
+    assert rows == [("Alex", date(1990, 1, 15)), ("Sam", date(2000, 5, 3))]
+
+
+def test_yearless_leap_day_gets_the_latest_leap_year():
+    assert parse_birthdate("--0229", now=datetime(2027, 6, 1)) == date(2024, 2, 29)
+    assert parse_birthdate("--02-29", now=datetime(2028, 6, 1)) == date(2028, 2, 29)
+
+
+def test_vcard_counts_unreadable_birthdays_as_invalid():
+    lines = [
+        "BEGIN:VCARD", "FN:Alex", "BDAY:--0229", "END:VCARD",
+        "BEGIN:VCARD", "FN:Sam", "BDAY:not a date", "END:VCARD",
+        "BEGIN:VCARD", "FN:Kim", "END:VCARD",
+    ]
+    result = ImportResult()
+
+    assert [name for name, _ in parse_vcard(lines, result)] == ["Alex"]
+    assert result.invalid == 1
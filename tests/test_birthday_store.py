@@ -0,0 +1,69 @@
+from datetime import date
+import pytest
+from benchmarks.fake_firestore import FakeFirestore
+from utils.birthday_store import FirestoreBirthdayStore, MemoryBirthdayStore, SQLiteBirthdayStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBirthdayStore()
+    return SQLiteBirthdayStore(str(tmp_path / "birthdays.db"))
+
+
+def test_upcoming_in_chat_only_returns_that_chats_birthdays(store):
+    store.add_many([
+        {"name": "Alex", "birthdate": "30-January-1990", "chat_id": 1},
+        {"name": "Sam", "birthdate": "29-February-2000", "chat_id": 1},
+        {"name": "Kim", "birthdate": "02-March-1985", "chat_id": 1},
+        {"name": "Other", "birthdate": "31-January-1990", "chat_id": 2},
+        {"name": "Later", "birthdate": "10-April-1990", "chat_id": 1},
+    ])
+
+    upcoming = [(day, record["name"]) for day, record in store.upcoming_in_chat(1, date(2027, 1, 28), 33)]
+
+    # 2027 is not a leap year, so the 29th February birthday comes up on the 28th
+    assert upcoming == [
+        (date(2027, 1, 30), "Alex"),
+        (date(2027, 2, 28), "Sam"),
+        (date(2027, 3, 2), "Kim"),
+    ]
+
+
+def test_upcoming_in_chat_follows_deletes(store):
+    store.add({"name": "Alex", "birthdate": "30-January-1990", "chat_id": 1})
+    [doc_id] = store.find(1, "alex")
+    store.delete(doc_id)
+
+    assert list(store.upcoming_in_chat(1, date(2027, 1, 28), 30)) == []
+
+
+def test_firestore_store_fills_its_cache_from_the_first_snapshot():
+    db = FakeFirestore()
+    db.collection("birthdays").add({"name": "Alex", "birthdate": "30-January-1990", "chat_id": 1})
+    db.collection("birthdays").add({"name": "Sam", "birthdate": "29-February-2000", "chat_id": 1})
+    store = FirestoreBirthdayStore(db)
+
+    store.open()
+
+    assert store.listening
+    assert sorted(record["name"] for record in store.for_chat(1)) == ["Alex", "Sam"]
+    # The collection is not streamed on top of the snapshot
+    assert db.collection("birthdays").reads == 0
+
+
+def test_firestore_store_streams_the_collection_without_a_listener(monkeypatch):
+    db = FakeFirestore()
+    db.collection("birthdays").add({"name": "Alex", "birthdate": "30-January-1990", "chat_id": 1})
+
+    def on_snapshot(callback):
+        raise RuntimeError("listener unavailable")
+
+    monkeypatch.setattr(db.collection("birthdays"), "on_snapshot", on_snapshot)
+    store = FirestoreBirthdayStore(db)
+
+    store.open()
+
+    assert not store.listening
+    assert [record["name"] for record in store.for_chat(1)] == ["Alex"]
+    assert db.collection("birthdays").reads == 1
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+import pytest
+from utils.dateparse import parse_birthday, parse_reminder
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.mark.parametrize("text", [
+    "Is today Alex's birthday?",
+    "is it anyone's birthday today",
+    "remind me of Alex's birthday tomorrow at 9am",
+    "when is Alex's birthday",
+    "Alex's birthday is 3 May",
+])
+def test_questions_and_unintroduced_names_fall_back_to_gemini(text):
+    assert parse_birthday(text, NOW) is None
+
+
+@pytest.mark.parametrize("text, name, birthdate", [
+    ("save the birthday of Alex on 20th December", "Alex", date(2026, 12, 20)),
+    ("save Alex's birthday on 3 May", "Alex", date(2026, 5, 3)),
+    ("add birthday for Mary Jane: 1990-02-03", "Mary Jane", date(1990, 2, 3)),
+])
+def test_explicit_saves_parse_locally(text, name, birthdate):
+    assert parse_birthday(text, NOW) == {"intent": "save", "name": name, "birthdate": birthdate}
+
+
+def test_delete_and_listing_parse_locally():
+    assert parse_birthday("delete Alex's birthday", NOW)["intent"] == "delete"
+    assert parse_birthday("show all birthdays", NOW)["intent"] == "list"
+    assert parse_birthday("upcoming birthdays", NOW)["intent"] == "upcoming"
+
+
+@pytest.mark.parametrize("text", [
+    "remind me to call mom on 05/06/2027 at 5pm",
+    "remind me to pay rent on 31 February at 9am",
+    "remind me on 12/25 at 9am to buy presents",
+])
+def test_unresolvable_dates_fall_back_to_gemini(text):
+    assert parse_reminder(text, NOW) is None
+
+
+def test_prefix_does_not_eat_the_start_of_a_date_word():
+    assert parse_reminder("remind me tomorrow at 8am to take my vitamins", NOW) == (
+        datetime(2026, 3, 2, 8, 0), "take my vitamins"
+    )
@@ -0,0 +1,43 @@
+import asyncio
+from utils.lanes import Lane
+
+
+def test_a_chat_backlog_does_not_hold_every_worker():
+    finished = {}
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def job(name):
+            await asyncio.sleep(0.05)
+            finished[name] = loop.time() - started
+
+        lane = Lane("llm", concurrency=4, max_queue=100)
+        for index in range(6):
+            lane.submit(1, job, f"chat1-{index}")
+        lane.submit(2, job, "chat2")
+        await asyncio.sleep(0.5)
+        return lane.stats()
+
+    stats = asyncio.run(main())
+
+    # Chat 2 runs alongside chat 1's first call instead of behind its backlog
+    assert finished["chat2"] < 0.09
+    assert sorted((name for name in finished if name.startswith("chat1")), key=finished.get) == [
+        f"chat1-{index}" for index in range(6)
+    ]
+    assert stats == {"queue_depth": 0, "busy_chats": 0, "rejected": 0}
+
+
+def test_full_lane_rejects_calls():
+    async def job():
+        await asyncio.sleep(0)
+
+    async def main():
+        lane = Lane("llm", concurrency=1, max_queue=2)
+        accepted = [lane.submit(chat_id, job) for chat_id in range(3)]
+        await asyncio.sleep(0.01)
+        return accepted, lane.rejected
+
+    assert asyncio.run(main()) == ([True, True, False], 1)
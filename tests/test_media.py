@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram.error import BadRequest
+from utils.media import MediaRegistry
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_animation(self, chat_id, animation, **kwargs):
+        self.sent.append(animation)
+        if animation == "expired-id":
+            raise BadRequest("Wrong file identifier/http url specified")
+        return SimpleNamespace(animation=SimpleNamespace(file_id="new-id"))
+
+
+def test_first_send_uses_the_url_and_later_sends_the_stored_file_id(tmp_path):
+    path = str(tmp_path / "media.db")
+    bot = FakeBot()
+    registry = MediaRegistry(path)
+    assert not (tmp_path / "media.db").exists()
+
+    asyncio.run(registry.send(bot, 1, "animation", "https://example.com/clock.gif"))
+    asyncio.run(MediaRegistry(path).send(bot, 2, "animation", "https://example.com/clock.gif"))
+
+    assert bot.sent == ["https://example.com/clock.gif", "new-id"]
+
+
+def test_rejected_file_id_falls_back_to_the_url_and_is_refreshed(tmp_path):
+    bot = FakeBot()
+    registry = MediaRegistry(str(tmp_path / "media.db"))
+    registry._open()
+    registry.file_ids[("animation", "https://example.com/clock.gif")] = "expired-id"
+
+    asyncio.run(registry.send(bot, 1, "animation", "https://example.com/clock.gif"))
+
+    assert bot.sent == ["expired-id", "https://example.com/clock.gif"]
+    assert registry.file_ids[("animation", "https://example.com/clock.gif")] == "new-id"
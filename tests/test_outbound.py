@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+pytest.importorskip("telegram")
+
+from utils.outbound import OutboundDispatcher
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append(("send_message", chat_id, text, kwargs))
+        return text
+
+    async def send_animation(self, chat_id, animation, **kwargs):
+        self.calls.append(("send_animation", chat_id, animation, kwargs))
+        return animation
+
+
+def test_send_message_passes_chat_id_to_the_bot():
+    bot = FakeBot()
+    dispatcher = OutboundDispatcher(global_rate=100, chat_rate=100, chat_burst=10)
+
+    result = asyncio.run(dispatcher.send_message(bot, 42, "⏰ Reminder: stretch"))
+
+    assert result == "⏰ Reminder: stretch"
+    assert bot.calls == [("send_message", 42, "⏰ Reminder: stretch", {})]
+    assert dispatcher.stats()["sent"] == 1
+
+
+def test_send_forwards_a_chat_id_keyword_to_the_method():
+    bot = FakeBot()
+    dispatcher = OutboundDispatcher(global_rate=100, chat_rate=100, chat_burst=10)
+
+    asyncio.run(dispatcher.send(7, bot.send_animation, chat_id=7, animation="gif", caption="time"))
+
+    assert bot.calls == [("send_animation", 7, "gif", {"caption": "time"})]
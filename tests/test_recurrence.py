@@ -0,0 +1,32 @@
+import pytest
+from utils.recurrence import parse_recurrence
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("remind me every evening to water plants", ("0 18 * * *", "water plants")),
+    ("every morning at 7 to run", ("0 7 * * *", "run")),
+    ("remind me every evening at 7 to call mom", ("0 19 * * *", "call mom")),
+    ("remind me every monday evening to call mom", ("0 18 * * 1", "call mom")),
+    ("remind me everyday at 5pm to stretch", ("0 17 * * *", "stretch")),
+    ("remind me every day at 6:30 to walk", ("30 6 * * *", "walk")),
+    ("remind me daily to drink water", ("0 9 * * *", "drink water")),
+    ("remind me every day to say good morning to the team", ("0 9 * * *", "say good morning to the team")),
+    ("remind me every day at 7 in the evening to walk", ("0 19 * * *", "walk")),
+])
+def test_recurring_reminders(text, expected):
+    assert parse_recurrence(text) == expected
+
+
+def test_everyday_as_an_adjective_is_not_a_recurrence():
+    assert parse_recurrence("review everyday expenses at 5pm") is None
+
+
+@pytest.mark.parametrize("text", [
+    "remind me tomorrow at 8am to take my daily vitamins",
+    "submit the daily report at 5pm",
+    "check each monday's slides at 9am",
+    "check each monday's slides at 9am tomorrow",
+    "remind me every monday on 25 December to call grandma",
+])
+def test_adjectives_and_one_shot_dates_are_not_recurrences(text):
+    assert parse_recurrence(text) is None
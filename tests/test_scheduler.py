@@ -0,0 +1,66 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from utils.scheduler import ReminderScheduler, MAX_ATTEMPTS, RETRY_DELAY
+
+
+def test_failed_one_shot_reminder_is_kept_and_retried_later(tmp_path):
+    sent = []
+
+    async def on_fire(reminder, context):
+        if not sent:
+            sent.append(None)
+            raise RuntimeError("Telegram unavailable")
+        sent.append(reminder.text)
+
+    scheduler = ReminderScheduler(str(tmp_path / "reminders.db"), on_fire)
+    reminder = scheduler.add(1, datetime.now() - timedelta(seconds=1), "stretch")
+
+    asyncio.run(scheduler._fire_due(None))
+    retry = scheduler.entries[reminder.id]
+    assert retry.fire_at >= time.time() + RETRY_DELAY - 5
+    assert scheduler.failures[reminder.id] == 1
+
+    # Due again: this time the send succeeds and the reminder is removed
+    scheduler._heap = [(0, reminder.id)]
+    asyncio.run(scheduler._fire_due(None))
+    assert sent == [None, "stretch"]
+    assert reminder.id not in scheduler.entries
+    assert scheduler.failures == {}
+
+
+class Blocked(Exception):
+    pass
+
+
+def test_reminder_is_dropped_when_its_chat_cannot_be_reached(tmp_path):
+    async def on_fire(reminder, context):
+        raise Blocked("bot was blocked by the user")
+
+    scheduler = ReminderScheduler(
+        str(tmp_path / "reminders.db"), on_fire, is_permanent=lambda error: isinstance(error, Blocked)
+    )
+    reminder = scheduler.add(1, datetime.now() - timedelta(seconds=1), "stretch", rule="0 9 * * *")
+
+    asyncio.run(scheduler._fire_due(None))
+    assert reminder.id not in scheduler.entries
+    assert scheduler.failures == {}
+    assert scheduler._db.execute("SELECT COUNT(*) FROM reminders").fetchone() == (0,)
+
+
+def test_reminder_is_dropped_after_max_attempts(tmp_path):
+    attempts = []
+
+    async def on_fire(reminder, context):
+        attempts.append(reminder.id)
+        raise RuntimeError("Telegram unavailable")
+
+    scheduler = ReminderScheduler(str(tmp_path / "reminders.db"), on_fire)
+    reminder = scheduler.add(1, datetime.now() - timedelta(seconds=1), "stretch")
+
+    for _ in range(MAX_ATTEMPTS):
+        scheduler._heap = [(0, reminder.id)]
+        asyncio.run(scheduler._fire_due(None))
+    assert len(attempts) == MAX_ATTEMPTS
+    assert reminder.id not in scheduler.entries
+    assert scheduler.failures == {}
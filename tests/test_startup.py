@@ -0,0 +1,12 @@
+from utils.metrics import metrics
+from utils.startup import StartupReport
+
+
+def test_timed_exports_a_startup_gauge_per_component():
+    report = StartupReport()
+
+    with report.timed("import", "bot"):
+        pass
+
+    assert [(kind, name) for kind, name, _ in report.timings] == [("import", "bot")]
+    assert 'telebot_startup_seconds{component="bot",kind="import"}' in metrics.render()
@@ -0,0 +1,195 @@
+import calendar
+import csv
+import logging
+import os
+import re
+from datetime import datetime
+from utils.dateparse import find_date
+
+logger = logging.getLogger(__name__)
+
+IMPORT_KINDS = {".csv": "csv", ".vcf": "vcard", ".vcard": "vcard", ".ics": "ics"}
+
+CSV_NAME_COLUMNS = ("name", "full name", "fullname", "display name", "contact")
+CSV_FIRST_LAST_COLUMNS = (("first name", "last name"), ("given name", "family name"))
+CSV_DATE_COLUMNS = ("birthday", "birthdate", "birth date", "date of birth", "dob", "date")
+
+# Calendar event titles such as "Alex's birthday", "Birthday: Alex" or "Alex - Birthday".
+# The name has to be tied to the word by a possessive, "of"/"for" or a dash or
+# colon, so titles like "Happy Birthday" or "Birthday party planning" are skipped
+ICS_SUMMARY = re.compile(
+    r"^\s*(?:(?P<prefix>.+?)(?:['’]s?\s*[-:–]?|\s*[-:–])\s*(?:birthday|bday)\s*$"
+    r"|(?:birthday|bday)(?:\s+(?:of|for)\s+|\s*[-:–]\s*)(?P<suffix>.+?)\s*$)",
+    re.I,
+)
+
+
+class ImportResult:
+    """
+    Counters reported back to the user at the end of an import.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+
+def import_kind(filename):
+    """
+    Return 'csv', 'vcard' or 'ics' from the file extension, or None if unsupported.
+    """
+    return IMPORT_KINDS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def parse_birthdate(value, now=None):
+    """
+    Parse a birthdate from a file field into a date.
+
+    Handles the compact vCard/iCalendar forms (19900115, --0115, --01-15)
+    and falls back to the local date parser. Dates without a year get the
+    current year, like chat-entered birthdays, except 29th February, which
+    gets the most recent leap year.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    now = now or datetime.now()
+    compact = re.fullmatch(r"(\d{4}|--)-?(\d{2})-?(\d{2})(?:T.*)?", value)
+    if compact:
+        year = now.year if compact.group(1) == "--" else int(compact.group(1))
+        if compact.group(1) == "--" and compact.group(2, 3) == ("02", "29"):
+            while not calendar.isleap(year):
+                year -= 1
+        try:
+            return datetime(year, int(compact.group(2)), int(compact.group(3))).date()
+        except ValueError:
+            return None
+    parsed, _ = find_date(value, now)
+    return parsed
+
+
+def _unfold(lines):
+    """
+    Join RFC 5545/6350 folded lines (continuations start with a space or tab).
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _property(line):
+    """
+    Split 'NAME;PARAMS:value' into ('NAME', value).
+    """
+    head, _, value = line.partition(":")
+    return head.split(";", 1)[0].strip().upper(), value.strip()
+
+
+def _unescape(value):
+    return value.replace("\\,", ",").replace("\\;", ";").replace("\\n", " ").replace("\\\\", "\\").strip()
+
+
+def parse_csv(lines, result):
+    reader = csv.reader(lines)
+    first_row = next(reader, [])
+    header = [column.strip().lower() for column in first_row]
+    name_column = next((header.index(c) for c in CSV_NAME_COLUMNS if c in header), None)
+    first_last = next(
+        ((header.index(first), header.index(last)) for first, last in CSV_FIRST_LAST_COLUMNS
+         if first in header and last in header),
+        None,
+    )
+    date_column = next((header.index(c) for c in CSV_DATE_COLUMNS if c in header), None)
+    if date_column is None or (name_column is None and first_last is None):
+        # No recognisable header: assume "name,birthdate" rows, header included
+        name_column, first_last, date_column = 0, None, 1
+        reader = _prepend(first_row, reader)
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if first_last is not None and name_column is None:
+            name = " ".join(row[i].strip() for i in first_last if i < len(row) and row[i].strip())
+        else:
+            name = row[name_column].strip() if name_column < len(row) else ""
+        birthdate = parse_birthdate(row[date_column]) if date_column < len(row) else None
+        if name and birthdate:
+            yield name, birthdate
+        else:
+            result.invalid += 1
+
+
+def _prepend(first, rows):
+    yield first
+    yield from rows
+
+
+def parse_vcard(lines, result):
+    name = full_name = birthday = bday = None
+    for line in _unfold(lines):
+        key, value = _property(line)
+        if key == "BEGIN":
+            name = full_name = birthday = bday = None
+        elif key == "FN":
+            full_name = _unescape(value)
+        elif key == "N" and value:
+            # N:Family;Given;Additional;Prefix;Suffix
+            parts = [_unescape(p) for p in value.split(";")]
+            name = " ".join(p for p in (parts[1] if len(parts) > 1 else "", parts[0]) if p)
+        elif key == "BDAY":
+            bday = value
+            birthday = parse_birthdate(value)
+        elif key == "END":
+            contact = full_name or name
+            if not bday:
+                # Contacts without a birthday are common in address book exports
+                continue
+            if contact and birthday:
+                yield contact, birthday
+            else:
+                result.invalid += 1
+
+
+def parse_ics(lines, result):
+    summary = start = None
+    in_event = False
+    for line in _unfold(lines):
+        key, value = _property(line)
+        if key == "BEGIN" and value.upper() == "VEVENT":
+            in_event, summary, start = True, None, None
+        elif in_event and key == "SUMMARY":
+            summary = _unescape(value)
+        elif in_event and key == "DTSTART":
+            start = parse_birthdate(value)
+        elif key == "END" and value.upper() == "VEVENT":
+            in_event = False
+            # Only events titled as birthdays count; other calendar entries are skipped
+            match = ICS_SUMMARY.match(summary or "")
+            name = (match.group("prefix") or match.group("suffix")).strip() if match else None
+            if name and start:
+                yield name, start
+            else:
+                result.invalid += 1
+
+
+PARSERS = {"csv": parse_csv, "vcard": parse_vcard, "ics": parse_ics}
+
+
+def parse_birthday_file(path, kind, result):
+    """
+    Stream (name, date) pairs out of an uploaded CSV, vCard or ICS file.
+
+    The file is read line by line, so large exports never sit in memory at
+    once. Entries that cannot be parsed are counted in `result.invalid`.
+    """
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as lines:
+        yield from PARSERS[kind](lines, result)
@@ -0,0 +1,73 @@
+import calendar
+from datetime import datetime, timedelta
+
+BIRTHDATE_FORMATS = ("%d-%B-%Y", "%Y-%m-%d")
+
+
+def parse_birthdate(value):
+    """
+    Parse a stored birthdate ('20-December-2000', or the older '2000-12-20').
+    """
+    for fmt in BIRTHDATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class BirthdayIndex:
+    """
+    Birthday records indexed by (month, day).
+
+    Birthdates are parsed once when a record is added, so looking up who has
+    a birthday on a given day is a dictionary lookup instead of a scan.
+    """
+
+    def __init__(self, records=()):
+        self._by_day = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        birthdate = parse_birthdate(record.get("birthdate"))
+        if birthdate is None:
+            return False
+        self._by_day.setdefault((birthdate.month, birthdate.day), []).append(record)
+        return True
+
+    def remove(self, record):
+        birthdate = parse_birthdate(record.get("birthdate"))
+        if birthdate is None:
+            return False
+        records = self._by_day.get((birthdate.month, birthdate.day), [])
+        for i, existing in enumerate(records):
+            if existing is record or existing == record:
+                del records[i]
+                if not records:
+                    del self._by_day[(birthdate.month, birthdate.day)]
+                return True
+        return False
+
+    def on(self, day):
+        """
+        Return the records whose birthday falls on the given date.
+
+        29th February birthdays are reported on 28th February outside leap years.
+        """
+        records = list(self._by_day.get((day.month, day.day), ()))
+        if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+            records.extend(self._by_day.get((2, 29), ()))
+        return records
+
+    def upcoming(self, start, days):
+        """
+        Yield (date, record) for every birthday from `start` through `start + days`.
+        """
+        for offset in range(days + 1):
+            day = start + timedelta(days=offset)
+            for record in self.on(day):
+                yield day, record
+
+    def __len__(self):
+        return sum(len(records) for records in self._by_day.values())
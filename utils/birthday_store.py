@@ -0,0 +1,467 @@
+import itertools
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from utils.birthday_index import BirthdayIndex, parse_birthdate
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
+# Seconds to wait for the snapshot listener's first snapshot before streaming the collection instead
+FIRESTORE_LOAD_TIMEOUT = 30
+
+
+class BirthdayRepository(ABC):
+    """
+    Storage interface BirthdayFunctionality depends on.
+
+    Records are dicts with 'name', 'birthdate' and 'chat_id' keys and are
+    identified by a string id. Each chat has a version number that changes
+    whenever its birthdays do, so views rendered from a chat's records can
+    be cached against it.
+    """
+
+    def open(self):
+        """
+        Prepare the store for use (load caches, start listeners).
+        """
+
+    def close(self):
+        pass
+
+    @property
+    def listening(self):
+        """
+        Whether changes made by other processes show up without refresh_chat().
+        """
+        return True
+
+    def refresh_chat(self, chat_id):
+        pass
+
+    @abstractmethod
+    def add(self, record):
+        """
+        Save a birthday and return its id.
+        """
+
+    def add_many(self, records):
+        """
+        Save several birthdays at once.
+        """
+        for record in records:
+            self.add(record)
+
+    @abstractmethod
+    def delete(self, doc_id):
+        pass
+
+    @abstractmethod
+    def find(self, chat_id, name):
+        """
+        Return the ids of this chat's birthdays saved under the given name.
+        """
+
+    @abstractmethod
+    def for_chat(self, chat_id):
+        """
+        Return this chat's birthdays sorted by name.
+        """
+
+    @abstractmethod
+    def version(self, chat_id):
+        pass
+
+    @abstractmethod
+    def on(self, day):
+        """
+        Return the records whose birthday falls on the given date, across all chats.
+        """
+
+    def upcoming(self, start, days):
+        """
+        Yield (date, record) for every birthday from `start` through `start + days`.
+        """
+        for offset in range(days + 1):
+            day = start + timedelta(days=offset)
+            for record in self.on(day):
+                yield day, record
+
+    def upcoming_in_chat(self, chat_id, start, days):
+        """
+        Like upcoming(), but only for this chat's birthdays.
+        """
+        return BirthdayIndex(self.for_chat(chat_id)).upcoming(start, days)
+
+
+class MemoryBirthdayStore(BirthdayRepository):
+    """
+    Birthdays held in memory, partitioned by chat_id and indexed by month/day,
+    both across all chats and within each chat.
+
+    Used on its own for tests and offline benchmarks, and as the cache
+    underneath FirestoreBirthdayStore.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.by_chat = {}
+        self.versions = {}
+        self.index = BirthdayIndex()
+        self.chat_indexes = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def add(self, record):
+        doc_id = f"mem{next(self._ids)}"
+        self._apply(doc_id, record)
+        return doc_id
+
+    def delete(self, doc_id):
+        self._discard(doc_id)
+
+    def find(self, chat_id, name):
+        name = name.lower()
+        with self._lock:
+            return [
+                doc_id for doc_id, record in self.by_chat.get(chat_id, {}).items()
+                if record.get("name", "").lower() == name
+            ]
+
+    def for_chat(self, chat_id):
+        with self._lock:
+            records = list(self.by_chat.get(chat_id, {}).values())
+        return sorted(records, key=lambda b: b.get("name", "").lower())
+
+    def version(self, chat_id):
+        return self.versions.get(chat_id, 0)
+
+    def on(self, day):
+        return self.index.on(day)
+
+    def upcoming(self, start, days):
+        return self.index.upcoming(start, days)
+
+    def upcoming_in_chat(self, chat_id, start, days):
+        with self._lock:
+            index = self.chat_indexes.get(chat_id)
+            return list(index.upcoming(start, days)) if index is not None else []
+
+    def _apply(self, doc_id, record):
+        with self._lock:
+            previous = self.records.get(doc_id)
+            if previous == record:
+                # Echo of a local write from the snapshot listener
+                return
+            if previous is not None:
+                self._unlink(doc_id, previous)
+            self.records[doc_id] = record
+            self.by_chat.setdefault(record.get("chat_id"), {})[doc_id] = record
+            self.index.add(record)
+            self.chat_indexes.setdefault(record.get("chat_id"), BirthdayIndex()).add(record)
+            self._bump(record.get("chat_id"))
+
+    def _discard(self, doc_id):
+        with self._lock:
+            previous = self.records.pop(doc_id, None)
+            if previous is not None:
+                self._unlink(doc_id, previous)
+            return previous
+
+    def _bump(self, chat_id):
+        self.versions[chat_id] = self.versions.get(chat_id, 0) + 1
+
+    def _unlink(self, doc_id, record):
+        self._bump(record.get("chat_id"))
+        self.index.remove(record)
+        partition = self.by_chat.get(record.get("chat_id"))
+        if partition is not None:
+            partition.pop(doc_id, None)
+            if not partition:
+                del self.by_chat[record.get("chat_id")]
+        index = self.chat_indexes.get(record.get("chat_id"))
+        if index is not None:
+            index.remove(record)
+            if not len(index):
+                del self.chat_indexes[record.get("chat_id")]
+
+
+class FirestoreBirthdayStore(MemoryBirthdayStore):
+    """
+    Write-through in-memory cache of the Firestore birthdays collection.
+
+    Opening the store starts a Firestore snapshot listener, whose first
+    snapshot delivers every document and fills the cache, so each document
+    is read once. The collection is only streamed if the listener cannot
+    start. After that, local writes are applied to the cache directly and
+    remote changes arrive through the listener, so reads never re-stream the
+    collection. `db` can be a Firestore client or any in-process fake with
+    the same API.
+    """
+
+    def __init__(self, db, collection="birthdays"):
+        super().__init__()
+        self.db = db
+        self.collection = collection
+        self._watch = None
+        self._loaded = threading.Event()
+
+    def open(self):
+        self.listen()
+        if self.listening and not self._loaded.wait(FIRESTORE_LOAD_TIMEOUT):
+            logger.error(f"No birthday snapshot from Firestore after {FIRESTORE_LOAD_TIMEOUT}s")
+        if self._loaded.is_set():
+            logger.info(f"Loaded {len(self.records)} birthdays")
+        else:
+            self.load()
+
+    def load(self):
+        """
+        Stream the collection once to fill the cache.
+        """
+        try:
+            with metrics.track("firestore", op="load"):
+                for doc in self.db.collection(self.collection).stream():
+                    self._apply(doc.id, doc.to_dict())
+        except Exception as e:
+            logger.error(f"Error loading birthdays from Firestore: {e}")
+        logger.info(f"Loaded {len(self.records)} birthdays")
+
+    def listen(self):
+        """
+        Subscribe to remote changes made by other processes or the console.
+        """
+        try:
+            self._watch = self.db.collection(self.collection).on_snapshot(self._on_snapshot)
+        except Exception as e:
+            logger.error(f"Error starting Firestore birthday listener: {e}")
+
+    @property
+    def listening(self):
+        return self._watch is not None
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, collection_snapshot, changes, read_time):
+        metrics.inc("firestore_snapshot_changes_total", len(changes))
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self._discard(change.document.id)
+            else:
+                self._apply(change.document.id, change.document.to_dict())
+        # The first snapshot carries the whole collection
+        self._loaded.set()
+
+    def add(self, record):
+        """
+        Write a birthday to Firestore and apply it to the cache. Returns the document id.
+        """
+        with metrics.track("firestore", op="add"):
+            _, ref = self.db.collection(self.collection).add(record)
+        self._apply(ref.id, record)
+        return ref.id
+
+    def add_many(self, records):
+        """
+        Write birthdays with Firestore batched writes, FIRESTORE_BATCH_LIMIT per
+        commit, and apply each committed batch to the cache.
+        """
+        collection = self.db.collection(self.collection)
+        for start in range(0, len(records), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            written = []
+            for record in records[start:start + FIRESTORE_BATCH_LIMIT]:
+                ref = collection.document()
+                batch.set(ref, record)
+                written.append((ref.id, record))
+            with metrics.track("firestore", op="batch"):
+                batch.commit()
+            for doc_id, record in written:
+                self._apply(doc_id, record)
+
+    def delete(self, doc_id):
+        """
+        Delete a birthday from Firestore and from the cache.
+        """
+        with metrics.track("firestore", op="delete"):
+            self.db.collection(self.collection).document(doc_id).delete()
+        self._discard(doc_id)
+
+    def refresh_chat(self, chat_id):
+        """
+        Re-read one chat's birthdays from Firestore with a `chat_id ==` query.
+
+        Only needed when the snapshot listener is not running.
+        """
+        with metrics.track("firestore", op="query"):
+            docs = {
+                doc.id: doc.to_dict()
+                for doc in self.db.collection(self.collection).where("chat_id", "==", chat_id).stream()
+            }
+        for doc_id in set(self.by_chat.get(chat_id, {})) - set(docs):
+            self._discard(doc_id)
+        for doc_id, record in docs.items():
+            self._apply(doc_id, record)
+
+
+class SQLiteBirthdayStore(BirthdayRepository):
+    """
+    Birthdays in a local SQLite file, for running without Firestore.
+
+    The database runs in WAL mode so readers never wait on a writer. Rows
+    are indexed by chat and by (month, day), so a save is a single insert,
+    a chat's listing is an index range scan and daily reminders look up one
+    day directly. Chat versions count this process's writes; with several
+    workers each chat is only written by the worker that owns it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.versions = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS birthdays ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "chat_id INTEGER, "
+            "name TEXT NOT NULL, "
+            "name_key TEXT NOT NULL, "
+            "birthdate TEXT NOT NULL, "
+            "month INTEGER, "
+            "day INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS birthdays_chat ON birthdays (chat_id, name_key)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS birthdays_month_day ON birthdays (month, day)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS birthdays_chat_day ON birthdays (chat_id, month, day)")
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _row(record):
+        birthdate = parse_birthdate(record.get("birthdate"))
+        return (
+            record.get("chat_id"),
+            record["name"],
+            record["name"].lower(),
+            record["birthdate"],
+            birthdate.month if birthdate else None,
+            birthdate.day if birthdate else None,
+        )
+
+    @staticmethod
+    def _record(row):
+        return {"name": row["name"], "birthdate": row["birthdate"], "chat_id": row["chat_id"]}
+
+    def _bump(self, chat_id):
+        self.versions[chat_id] = self.versions.get(chat_id, 0) + 1
+
+    def add(self, record):
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO birthdays (chat_id, name, name_key, birthdate, month, day) VALUES (?, ?, ?, ?, ?, ?)",
+                self._row(record),
+            )
+            self._db.commit()
+            self._bump(record.get("chat_id"))
+        return str(cursor.lastrowid)
+
+    def add_many(self, records):
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO birthdays (chat_id, name, name_key, birthdate, month, day) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(record) for record in records],
+            )
+            self._db.commit()
+            for chat_id in {record.get("chat_id") for record in records}:
+                self._bump(chat_id)
+
+    def delete(self, doc_id):
+        with self._lock:
+            row = self._db.execute("SELECT chat_id FROM birthdays WHERE id = ?", (int(doc_id),)).fetchone()
+            self._db.execute("DELETE FROM birthdays WHERE id = ?", (int(doc_id),))
+            self._db.commit()
+            if row is not None:
+                self._bump(row["chat_id"])
+
+    def find(self, chat_id, name):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM birthdays WHERE chat_id = ? AND name_key = ?", (chat_id, name.lower())
+            ).fetchall()
+        return [str(row["id"]) for row in rows]
+
+    def for_chat(self, chat_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, birthdate, chat_id FROM birthdays WHERE chat_id = ? ORDER BY name_key", (chat_id,)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def version(self, chat_id):
+        return self.versions.get(chat_id, 0)
+
+    def on(self, day):
+        # 29th February birthdays are reported on 28th February outside leap years
+        days = [(day.month, day.day)]
+        if (day.month, day.day) == (2, 28) and (day + timedelta(days=1)).month == 3:
+            days.append((2, 29))
+        with self._lock:
+            rows = [
+                row
+                for month, day_of_month in days
+                for row in self._db.execute(
+                    "SELECT name, birthdate, chat_id FROM birthdays WHERE month = ? AND day = ?",
+                    (month, day_of_month),
+                )
+            ]
+        return [self._record(row) for row in rows]
+
+    def upcoming_in_chat(self, chat_id, start, days):
+        # One (chat_id, month, day) index range per calendar month in the window
+        ranges = {}
+        for offset in range(days + 1):
+            day = start + timedelta(days=offset)
+            low, high = ranges.get(day.month, (day.day, day.day))
+            ranges[day.month] = (min(low, day.day), max(high, day.day))
+        if 2 in ranges:
+            # 29th February birthdays may be reported on the 28th
+            low, high = ranges[2]
+            ranges[2] = (low, max(high, 29))
+        with self._lock:
+            rows = [
+                row
+                for month, (low, high) in ranges.items()
+                for row in self._db.execute(
+                    "SELECT name, birthdate, chat_id FROM birthdays "
+                    "WHERE chat_id = ? AND month = ? AND day BETWEEN ? AND ?",
+                    (chat_id, month, low, high),
+                )
+            ]
+        return BirthdayIndex(self._record(row) for row in rows).upcoming(start, days)
+
+
+def create_birthday_store(kind, db=None, path=None):
+    """
+    Build the birthday store named by BIRTHDAY_STORE: 'firestore', 'sqlite' or 'memory'.
+    """
+    if kind == "memory":
+        return MemoryBirthdayStore()
+    if kind == "sqlite":
+        return SQLiteBirthdayStore(path)
+    if kind == "firestore":
+        if db is None:
+            from utils.firebase import get_firestore_client
+            db = get_firestore_client()
+        return FirestoreBirthdayStore(db)
+    raise ValueError(f"Unknown birthday store: {kind}")
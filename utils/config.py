@@ -1,11 +1,140 @@
-import google.generativeai as genai
+import os
+import threading
 
 # Replace with your API keys
 TELEGRAM_TOKEN = "tele tokennnnn7551480728:AAHXUv-sSrkjluC-Ehubaj1OjUevLRYUbzktokennntelegramknhn"
 GEMINI_API_KEY = "geminitokennnnAIzaSyBulnqflbB3SRzg4bR-wnG648jVACQGJ2ggeminii"
+# Bot API endpoint; override to point the bot at a local stand-in server
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL")
 BIRTHDAYS_FILE = "Birthdays.json"
+# Birthday storage: "firestore" (default), "sqlite" (BIRTHDAYS_DB file) or "memory"
+BIRTHDAY_STORE = os.getenv("BIRTHDAY_STORE", "firestore")
+BIRTHDAYS_DB = os.getenv("BIRTHDAYS_DB", "birthdays.db")
+REMINDERS_DB = os.getenv("REMINDERS_DB", "reminders.db")
+# Telegram file_ids of the bot's GIFs and images, so each is fetched from its URL once
+MEDIA_CACHE_PATH = os.getenv("MEDIA_CACHE_PATH", "media.db")
 FIREBASE_SERVICE_ACCOUNT_KEY = "D:/My Works/TelegramBot/telegrambotllm-firebase-adminsdk-6lsyf-b77d01b0b7.json"
 
-# Initialize Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-pro')
+# Serving mode: "polling" (default) or "webhook". In webhook mode the bot runs
+# its own HTTP listener and registers WEBHOOK_URL with Telegram; updates whose
+# X-Telegram-Bot-Api-Secret-Token header does not match WEBHOOK_SECRET are rejected.
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Worker processes; above 1 the main process only receives updates and forwards
+# each one to the worker that owns its chat (chat_id modulo WORKERS)
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Number of updates processed at the same time (1 keeps updates strictly in order);
+# routed text messages are only queued here and run on the update lanes below
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "1"))
+
+# Outbound sends: Telegram allows about 30 messages/s overall and 1 message/s per chat
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+# LLM gateway: maximum concurrent Gemini calls and per-call timeout in seconds
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+# Update lanes: routed messages run in separate pools so Gemini-bound handlers
+# cannot hold up local-only ones. Each lane has its own concurrency limit and a
+# bounded queue; a message arriving while its lane's queue is full gets a busy reply.
+LANES = {
+    "fast": {
+        "concurrency": int(os.getenv("LANE_FAST_CONCURRENCY", "16")),
+        "max_queue": int(os.getenv("LANE_FAST_QUEUE", "1000")),
+    },
+    "llm": {
+        "concurrency": int(os.getenv("LANE_LLM_CONCURRENCY", str(LLM_MAX_CONCURRENCY))),
+        "max_queue": int(os.getenv("LANE_LLM_QUEUE", "100")),
+    },
+}
+
+# Chat replies: stream the answer into a placeholder message, editing it at most
+# once every STREAM_EDIT_INTERVAL seconds
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "1") == "1"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+
+# Chat bursts: messages from one chat arriving less than CHAT_DEBOUNCE seconds
+# apart are answered together (0 disables), waiting at most CHAT_DEBOUNCE_MAX seconds
+CHAT_DEBOUNCE = float(os.getenv("CHAT_DEBOUNCE", "0.7"))
+CHAT_DEBOUNCE_MAX = float(os.getenv("CHAT_DEBOUNCE_MAX", "3.0"))
+
+# Chat memory: recent turns kept per chat, prompt token budget and number of chats remembered
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "10"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "1500"))
+CHAT_MAX_CONVERSATIONS = int(os.getenv("CHAT_MAX_CONVERSATIONS", "1000"))
+
+# Metrics: Prometheus text endpoint on METRICS_PORT (0 disables it) and a
+# summary logged every METRICS_LOG_INTERVAL seconds (0 disables it)
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", "300"))
+
+# LLM response cache: TTL in seconds per Functionality (0 disables caching),
+# in-memory entry limit and optional SQLite file to persist entries across restarts
+LLM_CACHE_TTLS = {
+    "chat": int(os.getenv("LLM_CACHE_TTL_CHAT", "3600")),
+    "birthday": int(os.getenv("LLM_CACHE_TTL_BIRTHDAY", "86400")),
+    # Reminder prompts depend on the current date and time
+    "reminder": int(os.getenv("LLM_CACHE_TTL_REMINDER", "0")),
+}
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-pro")
+
+# Model tiers: structured tasks (classification, JSON extraction, summaries) go to
+# the small "fast" model and open-ended chat replies to the "large" one. Prices are
+# USD per million tokens and only feed the cost metrics.
+LLM_TIERS = {
+    "fast": {
+        "model": os.getenv("LLM_FAST_MODEL", "gemini-1.5-flash"),
+        "max_output_tokens": int(os.getenv("LLM_FAST_MAX_TOKENS", "512")),
+        "temperature": float(os.getenv("LLM_FAST_TEMPERATURE", "0")),
+        "timeout": float(os.getenv("LLM_FAST_TIMEOUT", "10")),
+        "input_price": float(os.getenv("LLM_FAST_INPUT_PRICE", "0.075")),
+        "output_price": float(os.getenv("LLM_FAST_OUTPUT_PRICE", "0.30")),
+    },
+    "large": {
+        "model": os.getenv("LLM_LARGE_MODEL", GEMINI_MODEL_NAME),
+        "max_output_tokens": int(os.getenv("LLM_LARGE_MAX_TOKENS", "2048")),
+        "temperature": float(os.getenv("LLM_LARGE_TEMPERATURE", "0.7")),
+        "timeout": float(os.getenv("LLM_LARGE_TIMEOUT", LLM_TIMEOUT)),
+        "input_price": float(os.getenv("LLM_LARGE_INPUT_PRICE", "0.5")),
+        "output_price": float(os.getenv("LLM_LARGE_OUTPUT_PRICE", "1.5")),
+    },
+}
+# Tier used by each call site, overridable as LLM_SITE_TIERS="chat=fast,reminder=large"
+LLM_SITE_TIERS = {"reminder": "fast", "birthday": "fast", "chat_summary": "fast", "chat": "large"}
+LLM_SITE_TIERS.update(
+    (site.strip(), tier.strip())
+    for site, _, tier in (pair.partition("=") for pair in os.getenv("LLM_SITE_TIERS", "").split(","))
+    if site.strip() and tier.strip() in LLM_TIERS
+)
+LLM_DEFAULT_TIER = os.getenv("LLM_DEFAULT_TIER", "large")
+
+_gemini_models = {}
+_gemini_lock = threading.Lock()
+
+
+def get_gemini_model(name=GEMINI_MODEL_NAME):
+    """
+    Return the named Gemini model, importing and configuring the SDK on first use.
+
+    Importing google.generativeai is slow, so it is kept off the startup path.
+    """
+    model = _gemini_models.get(name)
+    if model is None:
+        with _gemini_lock:
+            model = _gemini_models.get(name)
+            if model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                model = _gemini_models[name] = genai.GenerativeModel(name)
+    return model
@@ -0,0 +1,98 @@
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token), good enough for budgeting.
+    """
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    __slots__ = ("summary", "turns", "tokens")
+
+    def __init__(self):
+        self.summary = ""
+        self.turns = deque()
+        self.tokens = 0
+
+
+class ConversationStore:
+    """
+    Bounded per-chat conversation history.
+
+    Each chat keeps its recent (user, assistant) turns in a ring buffer.
+    When the turns exceed `max_turns` or the token budget, the oldest ones
+    are folded into a running summary by the `summarize` coroutine, so the
+    assembled prompt stays the same size however long the conversation runs.
+    Idle chats are evicted least-recently-used first beyond `max_chats`.
+    """
+
+    def __init__(self, summarize, max_chats=1000, max_turns=10, token_budget=1500):
+        self.summarize = summarize
+        self.max_chats = max_chats
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        # Keep a quarter of the budget for the summary and the new message
+        self.turn_budget = token_budget * 3 // 4
+        self.summary_budget = token_budget // 4
+        self._chats = OrderedDict()
+
+    def _get(self, chat_id):
+        conversation = self._chats.get(chat_id)
+        if conversation is None:
+            conversation = self._chats[chat_id] = Conversation()
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        self._chats.move_to_end(chat_id)
+        return conversation
+
+    def build_prompt(self, chat_id, message):
+        """
+        Assemble the summary, the recent turns and the new message into one prompt.
+        """
+        conversation = self._chats.get(chat_id)
+        if conversation is None or (not conversation.summary and not conversation.turns):
+            return message
+
+        parts = []
+        if conversation.summary:
+            parts.append(f"Summary of the earlier conversation:\n{conversation.summary}\n")
+        for user, assistant in conversation.turns:
+            parts.append(f"User: {user}\nAssistant: {assistant}")
+        parts.append(f"User: {message}\nAssistant:")
+        return "\n".join(parts)
+
+    async def add_turn(self, chat_id, user, assistant):
+        """
+        Record a completed exchange and fold old turns into the summary if needed.
+        """
+        conversation = self._get(chat_id)
+        conversation.turns.append((user, assistant))
+        conversation.tokens += estimate_tokens(user) + estimate_tokens(assistant)
+
+        folded = []
+        while conversation.turns and (
+            len(conversation.turns) > self.max_turns or conversation.tokens > self.turn_budget
+        ):
+            old_user, old_assistant = conversation.turns.popleft()
+            conversation.tokens -= estimate_tokens(old_user) + estimate_tokens(old_assistant)
+            folded.append((old_user, old_assistant))
+
+        if folded:
+            try:
+                summary = await self.summarize(conversation.summary, folded)
+            except Exception as e:
+                logger.error(f"Error summarizing conversation: {e}")
+                summary = conversation.summary
+            # Hard cap in case the summary comes back longer than asked for
+            conversation.summary = summary[: self.summary_budget * 4]
+
+    def clear(self, chat_id):
+        self._chats.pop(chat_id, None)
+
+    def __len__(self):
+        return len(self._chats)
@@ -0,0 +1,283 @@
+import calendar
+import logging
+import re
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {}
+for _number in range(1, 13):
+    MONTHS[calendar.month_name[_number].lower()] = _number
+    MONTHS[calendar.month_abbr[_number].lower()] = _number
+MONTHS["sept"] = 9
+
+WEEKDAYS = {calendar.day_name[i].lower(): i for i in range(7)}
+
+_MONTH = r"(?P<month>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_ORDINAL = r"(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(?P<year>\d{4}))?"
+
+DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")),
+    ("numeric", re.compile(r"\b(?P<a>\d{1,2})(?P<sep>[/.-])(?P<b>\d{1,2})(?P=sep)(?P<year>\d{4}|\d{2})\b")),
+    ("day_month", re.compile(r"\b(?P<day>\d{1,2})" + _ORDINAL + r"\s+(?:of\s+)?" + _MONTH + _YEAR + r"\b", re.I)),
+    ("month_day", re.compile(r"\b" + _MONTH + r"\s+(?P<day>\d{1,2})" + _ORDINAL + _YEAR + r"\b", re.I)),
+    ("relative_day", re.compile(r"\b(?P<word>day after tomorrow|today|tonight|tomorrow)\b", re.I)),
+    ("in_days", re.compile(r"\bin\s+(?P<count>\d+|a|an|one|two|three)\s+(?P<unit>days?|weeks?)\b", re.I)),
+    ("weekday", re.compile(r"\b(?:(?P<next>next|this|on)\s+)?(?P<weekday>" + "|".join(WEEKDAYS) + r")\b", re.I)),
+    # '12/25' without a year: day and month order cannot be told from one date
+    ("numeric_no_year", re.compile(r"\b\d{1,2}/\d{1,2}\b(?!/)")),
+]
+
+TIME_PATTERNS = [
+    ("in_minutes", re.compile(r"\bin\s+(?P<count>\d+|a|an|one|two|three)\s+(?P<unit>minutes?|mins?|hours?|hrs?)\b", re.I)),
+    ("meridiem", re.compile(r"\b(?:at\s+)?(?P<hour>\d{1,2})(?:[:.](?P<minute>[0-5]\d))?\s*(?P<meridiem>[ap])\.?m\.?(?!\w)", re.I)),
+    ("clock", re.compile(r"\b(?:at\s+)?(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)\b")),
+    ("named", re.compile(r"\b(?:at\s+)?(?P<word>noon|midnight)\b", re.I)),
+]
+
+WORD_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}
+
+REMINDER_PREFIX = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:can|could)\s+you\s+)?"
+    r"(?:remind\s+me\s+(?:(?:to|about|that|of)\b)?|set\s+(?:a|an)\s+reminder\s+(?:(?:to|for|about)\b)?|reminder\s*:?)\s*",
+    re.I,
+)
+DANGLING_WORDS = re.compile(r"^(?:at|on|by|for|to|in|and)\b\s*|\s*\b(?:at|on|by|for|in|and)$", re.I)
+
+# A name is only taken from a 'birthday of/for' phrase or after an explicit verb,
+# so questions such as "is today Alex's birthday?" never parse as a save
+BIRTHDAY_NAME_PATTERNS = [
+    re.compile(r"\b(?:birthday|bday)\s+(?:of|for)\s+(?P<name>[A-Za-z][A-Za-z .'-]*?)\s*(?:\b(?:on|is|as|at)\b|[:,]|$)", re.I),
+    re.compile(r"\b(?:save|add|remember|store|note|delete|remove|forget|that)\s+(?P<name>[A-Za-z][A-Za-z .-]*?)['’]s\s+(?:birthday|bday)\b", re.I),
+]
+QUESTION = re.compile(r"\?\s*$|^\s*(?:is|was|when|did)\b", re.I)
+NAME_STOPWORDS = {"the", "my", "a", "save", "add", "remember", "store", "note", "delete", "remove", "forget", "that", "all", "birthday", "birthdays"}
+
+
+class LocalParseStats:
+    """
+    Hit/miss counters for the local parser, per call site.
+    """
+
+    def __init__(self):
+        self.hits = {}
+        self.misses = {}
+
+    def record(self, kind, hit):
+        counter = self.hits if hit else self.misses
+        counter[kind] = counter.get(kind, 0) + 1
+        total = self.hits.get(kind, 0) + self.misses.get(kind, 0)
+        if total % 100 == 0:
+            logger.info(f"Local {kind} parser hit rate {self.hit_rate(kind):.0%} over {total} messages")
+
+    def hit_rate(self, kind):
+        hits = self.hits.get(kind, 0)
+        total = hits + self.misses.get(kind, 0)
+        return hits / total if total else 0.0
+
+    def summary(self):
+        kinds = set(self.hits) | set(self.misses)
+        return {
+            kind: {
+                "hits": self.hits.get(kind, 0),
+                "misses": self.misses.get(kind, 0),
+                "hit_rate": self.hit_rate(kind),
+            }
+            for kind in sorted(kinds)
+        }
+
+
+parse_stats = LocalParseStats()
+
+
+def _count(value):
+    return WORD_NUMBERS.get(value.lower(), None) or int(value)
+
+
+def _safe_date(year, month, day):
+    try:
+        return datetime(year, month, day).date()
+    except ValueError:
+        return None
+
+
+def find_date(text, now=None):
+    """
+    Find the first date in the text.
+
+    Returns (date, span), or (None, None) when the text names no date.
+    Date-like text that cannot be resolved, such as the ambiguous
+    '05/06/2024' or the impossible '31 February', returns (None, span) so
+    callers can fall back to Gemini instead of assuming no date was given.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    for kind, pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        parsed = None
+
+        if kind == "iso":
+            parsed = _safe_date(int(groups["year"]), int(groups["month"]), int(groups["day"]))
+        elif kind == "numeric":
+            a, b, year = int(groups["a"]), int(groups["b"]), int(groups["year"])
+            if year < 100:
+                year += 2000
+            if a > 12:
+                day, month = a, b
+            elif b > 12:
+                month, day = a, b
+            elif groups["sep"] != "/":
+                # '27-12-2024' / '05.06.2024' style dates are day first
+                day, month = a, b
+            else:
+                return None, match.span()
+            parsed = _safe_date(year, month, day)
+        elif kind in ("day_month", "month_day"):
+            year = int(groups["year"]) if groups.get("year") else today.year
+            parsed = _safe_date(year, MONTHS[groups["month"].lower()], int(groups["day"]))
+        elif kind == "relative_day":
+            word = groups["word"].lower()
+            offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[word]
+            parsed = today + timedelta(days=offset)
+        elif kind == "in_days":
+            days = _count(groups["count"]) * (7 if groups["unit"].lower().startswith("week") else 1)
+            parsed = today + timedelta(days=days)
+        elif kind == "weekday":
+            ahead = (WEEKDAYS[groups["weekday"].lower()] - today.weekday()) % 7
+            if ahead == 0 and (groups["next"] or "").lower() == "next":
+                ahead = 7
+            parsed = today + timedelta(days=ahead)
+
+        return parsed, match.span()
+    return None, None
+
+
+def find_time(text, now=None):
+    """
+    Find the first time of day in the text.
+
+    Returns (value, span, is_relative) where value is a (hour, minute) tuple,
+    or a full datetime for relative phrases like 'in 10 minutes'.
+    """
+    now = now or datetime.now()
+    for kind, pattern in TIME_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+
+        if kind == "in_minutes":
+            amount = _count(groups["count"])
+            unit = groups["unit"].lower()
+            delta = timedelta(hours=amount) if unit.startswith("h") else timedelta(minutes=amount)
+            return (now + delta).replace(second=0, microsecond=0), match.span(), True
+        if kind == "meridiem":
+            hour = int(groups["hour"])
+            if not 1 <= hour <= 12:
+                return None, None, False
+            hour = hour % 12 + (12 if groups["meridiem"].lower() == "p" else 0)
+            return (hour, int(groups["minute"] or 0)), match.span(), False
+        if kind == "clock":
+            return (int(groups["hour"]), int(groups["minute"])), match.span(), False
+        if kind == "named":
+            return ((12, 0) if groups["word"].lower() == "noon" else (0, 0)), match.span(), False
+    return None, None, False
+
+
+def _remove_spans(text, spans):
+    for start, end in sorted((s for s in spans if s), reverse=True):
+        text = text[:start] + " " + text[end:]
+    return text
+
+
+def parse_reminder(text, now=None):
+    """
+    Parse a reminder such as 'remind me to call mom tomorrow at 5pm'.
+
+    Returns (reminder_time, content), or None when the text is not
+    understood confidently. A time without a date means today, or tomorrow
+    if that time has already passed.
+    """
+    now = now or datetime.now()
+    time_value, time_span, is_relative = find_time(text, now)
+    if time_value is None:
+        return None
+
+    if is_relative:
+        reminder_time = time_value
+        date_span = None
+    else:
+        date_value, date_span = find_date(text, now)
+        if date_value is None and date_span is not None:
+            return None
+        hour, minute = time_value
+        day = date_value or now.date()
+        reminder_time = datetime(day.year, day.month, day.day, hour, minute)
+        if date_value is None and reminder_time <= now:
+            reminder_time += timedelta(days=1)
+
+    content = reminder_content(text, [time_span, date_span])
+    if content is None:
+        return None
+    return reminder_time, content
+
+
+def reminder_content(text, spans):
+    """
+    Return what to be reminded of: the text without the given date/time spans,
+    the 'remind me to' prefix and dangling prepositions. None if nothing is left.
+    """
+    content = _remove_spans(text, spans)
+    content = REMINDER_PREFIX.sub("", content)
+    content = re.sub(r"\s+", " ", content).strip(" .,!?:;-")
+    previous = None
+    while previous != content:
+        previous = content
+        content = DANGLING_WORDS.sub("", content).strip(" .,!?:;-")
+    if not content or not re.search(r"[A-Za-z]", content):
+        return None
+    return content
+
+
+def parse_birthday(text, now=None):
+    """
+    Parse a birthday request into {'intent', 'name', 'birthdate'}.
+
+    birthdate is a date or None. Returns None when the request is not
+    understood confidently. Questions are always left to Gemini.
+    """
+    if QUESTION.search(text):
+        return None
+    now = now or datetime.now()
+    lowered = text.lower()
+    birthdate, date_span = find_date(text, now)
+    if birthdate is None and date_span is not None:
+        return None
+    remaining = _remove_spans(text, [date_span])
+
+    name = None
+    for pattern in BIRTHDAY_NAME_PATTERNS:
+        match = pattern.search(remaining)
+        if match:
+            words = [w for w in match.group("name").strip(" .-").split() if w.lower() not in NAME_STOPWORDS]
+            if 0 < len(words) <= 4:
+                name = " ".join(words)
+                break
+
+    if re.search(r"\b(?:delete|remove|forget)\b", lowered):
+        return {"intent": "delete", "name": name, "birthdate": None} if name else None
+    if re.search(r"\b(?:save|add|remember|store|note)\b", lowered) or (name and birthdate):
+        if name and birthdate:
+            return {"intent": "save", "name": name, "birthdate": birthdate}
+        return None
+    if name or birthdate:
+        return None
+    if re.search(r"\b(?:upcoming|coming up|next|soon|this (?:week|month))\b", lowered):
+        return {"intent": "upcoming", "name": None, "birthdate": None}
+    if re.search(r"\b(?:show|list|display|see|view|get|all)\b", lowered):
+        return {"intent": "list", "name": None, "birthdate": None}
+    return None
@@ -1,16 +1,29 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import threading
+
+_service_account_key_path = None
+_client = None
+_lock = threading.Lock()
 
 def initialize_firebase(service_account_key_path):
     """
-    Initialize Firebase Admin SDK with the service account key.
+    Remember the service account key; the Firebase Admin SDK is only loaded
+    when the first Firestore client is requested.
     """
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(service_account_key_path)
-        firebase_admin.initialize_app(cred)
+    global _service_account_key_path
+    _service_account_key_path = service_account_key_path
 
 def get_firestore_client():
     """
-    Return a Firestore client instance.
+    Return the shared Firestore client instance, initializing Firebase on first use.
     """
-    return firestore.client()
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                if not firebase_admin._apps:
+                    cred = credentials.Certificate(_service_account_key_path)
+                    firebase_admin.initialize_app(cred)
+                _client = firestore.client()
+    return _client
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from utils.config import LANES
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Reply to a message turned away because its lane's queue is full
+BUSY_TEXT = "I'm handling a lot of messages right now. Please try again in a moment."
+
+
+class Lane:
+    """
+    A bounded queue of handler calls served by `concurrency` worker tasks.
+
+    Each chat has its own FIFO of calls, and a chat is only put on the
+    shared ready queue when it has a call to run and none running. A chat
+    with a backlog therefore holds at most one worker, its calls run in the
+    order they were submitted, and other chats keep the remaining workers.
+    """
+
+    def __init__(self, name, concurrency, max_queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._ready = asyncio.Queue()
+        self._chats = {}
+        self._workers = []
+        self.pending = 0
+        self.rejected = 0
+
+    def submit(self, chat_id, callback, *args):
+        """
+        Queue `callback(*args)`. Returns False if the lane's queue is full.
+        """
+        if not self._workers:
+            # Started on first use, from inside the running event loop
+            self._workers = [
+                asyncio.get_running_loop().create_task(self._work(), name=f"lane-{self.name}-{index}")
+                for index in range(self.concurrency)
+            ]
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            metrics.inc("lane_rejected_total", lane=self.name)
+            return False
+        calls = self._chats.get(chat_id)
+        if calls is None:
+            calls = self._chats[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        calls.append((time.monotonic(), callback, args))
+        self.pending += 1
+        metrics.add_gauge("lane_queue_depth", 1, lane=self.name)
+        return True
+
+    async def _work(self):
+        while True:
+            chat_id = await self._ready.get()
+            calls = self._chats[chat_id]
+            # The call stays at the head of the chat's FIFO while it runs, so
+            # new calls for the chat queue behind it instead of being made ready
+            queued_at, callback, args = calls[0]
+            self.pending -= 1
+            metrics.add_gauge("lane_queue_depth", -1, lane=self.name)
+            metrics.observe("lane_wait_seconds", time.monotonic() - queued_at, lane=self.name)
+            try:
+                with metrics.track("lane", lane=self.name):
+                    await callback(*args)
+            except Exception:
+                logger.exception(f"Error in {self.name} lane handler")
+            finally:
+                calls.popleft()
+                if calls:
+                    # Back of the line, so busy chats take turns with the others
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+
+    def stats(self):
+        return {
+            "queue_depth": self.pending,
+            "busy_chats": len(self._chats),
+            "rejected": self.rejected,
+        }
+
+
+class Lanes:
+    """
+    The update lanes configured in LANES, by name.
+
+    Handlers that only do local work go to the "fast" lane and handlers that
+    wait on Gemini to the "llm" lane, so a backlog of slow LLM requests only
+    queues up behind its own concurrency limit.
+    """
+
+    def __init__(self, config=LANES):
+        self.lanes = {
+            name: Lane(name, settings["concurrency"], settings["max_queue"])
+            for name, settings in config.items()
+        }
+
+    def submit(self, lane, chat_id, callback, *args):
+        return self.lanes[lane].submit(chat_id, callback, *args)
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+lanes = Lanes()
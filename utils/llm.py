@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import (
+    get_gemini_model, LLM_TIERS, LLM_SITE_TIERS, LLM_DEFAULT_TIER, LLM_MAX_CONCURRENCY, LLM_TIMEOUT,
+    LLM_CACHE_TTLS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH,
+)
+from utils.llm_cache import LLMCache
+from utils.conversation import estimate_tokens
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """
+    Shared entry point for every Gemini call made by the bot.
+
+    The Gemini SDK call is blocking, so it runs on a dedicated thread pool
+    instead of the event loop. A semaphore caps how many calls are in flight
+    at once and every call is bounded by a timeout. The Gemini model is
+    only built on first use. Identical prompts requested while one is
+    already in flight share that call instead of starting another.
+
+    Each call site maps to a model tier in LLM_SITE_TIERS; the tier's
+    profile in LLM_TIERS sets the model, output token limit, temperature
+    and timeout, and latency, tokens and cost are recorded per tier.
+    """
+
+    def __init__(self, model=None, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT, cache=None):
+        self._model = model
+        self.cache = cache
+        self._pending = {}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Timed-out calls keep their worker thread until the SDK returns, so
+        # leave some headroom above the concurrency limit.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency * 2, thread_name_prefix="llm"
+        )
+        self.calls = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    @property
+    def model(self):
+        return self.model_for(LLM_DEFAULT_TIER)
+
+    @model.setter
+    def model(self, model):
+        # An explicit model (a fake in benchmarks) serves every tier
+        self._model = model
+
+    @staticmethod
+    def tier_for(site):
+        tier = LLM_SITE_TIERS.get(site, LLM_DEFAULT_TIER)
+        return tier, LLM_TIERS[tier]
+
+    def model_for(self, tier):
+        if self._model is not None:
+            return self._model
+        return get_gemini_model(LLM_TIERS[tier]["model"])
+
+    def model_name(self, tier):
+        # Cache keys must not force the SDK import
+        if self._model is not None:
+            return getattr(self._model, "model_name", "")
+        return f"models/{LLM_TIERS[tier]['model']}"
+
+    @staticmethod
+    def generation_config(profile):
+        return {"max_output_tokens": profile["max_output_tokens"], "temperature": profile["temperature"]}
+
+    def warm_up(self):
+        """
+        Build the Gemini model of every tier now instead of on the first call.
+        """
+        return [self.model_for(tier) for tier in LLM_TIERS]
+
+    async def generate(self, prompt, timeout=None, cache_namespace=None, site=None):
+        """
+        Send a prompt to Gemini and return the stripped response text.
+
+        When `cache_namespace` names a Functionality with a positive TTL in
+        LLM_CACHE_TTLS, identical prompts are answered from the cache.
+        `site` labels the call in the metrics and defaults to the namespace.
+        Raises asyncio.TimeoutError if the call exceeds the timeout, and
+        re-raises any error from the SDK.
+        """
+        site = site or cache_namespace or "default"
+        tier, profile = self.tier_for(site)
+        key = LLMCache.make_key(self.model_name(tier), prompt)
+        ttl = LLM_CACHE_TTLS.get(cache_namespace, 0) if self.cache and cache_namespace else 0
+        if ttl > 0:
+            cached = self.cache.get(key, cache_namespace)
+            if cached is not None:
+                metrics.inc("llm_cache_hits_total", site=site)
+                return cached
+
+        # Single flight: join an identical call that is already running
+        shared = self._pending.get(key)
+        if shared is not None:
+            self.deduplicated += 1
+            metrics.inc("llm_deduplicated_total", site=site)
+        else:
+            shared = asyncio.ensure_future(self._call_and_cache(prompt, timeout, site, key, ttl))
+            self._pending[key] = shared
+            shared.add_done_callback(lambda future: self._forget(key, future))
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(shared)
+
+    async def _call_and_cache(self, prompt, timeout, site, key, ttl):
+        text = await self._call(prompt, timeout, site)
+        if ttl > 0:
+            self.cache.set(key, text, ttl)
+        return text
+
+    def _forget(self, key, future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        # Mark the outcome as retrieved in case every caller was cancelled
+        if not future.cancelled():
+            future.exception()
+
+    async def stream(self, prompt, timeout=None, cache_namespace=None, site=None):
+        """
+        Yield the response text chunk by chunk as Gemini streams it.
+
+        The timeout bounds the whole generation. A cached response is yielded
+        as a single chunk, and a completed stream is stored in the cache.
+        """
+        site = site or cache_namespace or "default"
+        tier, profile = self.tier_for(site)
+        ttl = LLM_CACHE_TTLS.get(cache_namespace, 0) if self.cache and cache_namespace else 0
+        if ttl > 0:
+            key = self.cache.make_key(self.model_name(tier), prompt)
+            cached = self.cache.get(key, cache_namespace)
+            if cached is not None:
+                metrics.inc("llm_cache_hits_total", site=site)
+                yield cached
+                return
+
+        timeout = profile.get("timeout", self.timeout) if timeout is None else timeout
+        await self._acquire(site)
+        deadline = time.monotonic() + timeout
+        chunks = []
+        last = None
+        with metrics.track("llm", site=site, tier=tier):
+            try:
+                loop = asyncio.get_running_loop()
+                response = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        self._executor,
+                        # As in _call, the model is resolved on the worker thread
+                        lambda: iter(self.model_for(tier).generate_content(
+                            prompt, stream=True, generation_config=self.generation_config(profile)
+                        )),
+                    ),
+                    timeout=timeout,
+                )
+                while True:
+                    chunk = await asyncio.wait_for(
+                        loop.run_in_executor(self._executor, next, response, None),
+                        timeout=max(0.0, deadline - time.monotonic()),
+                    )
+                    if chunk is None:
+                        break
+                    last = chunk
+                    text = chunk.text
+                    if text:
+                        chunks.append(text)
+                        yield text
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error(f"Gemini stream timed out after {timeout}s")
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+
+        self._record_usage(site, tier, profile, prompt, last, "".join(chunks))
+        if ttl > 0 and chunks:
+            self.cache.set(key, "".join(chunks).strip(), ttl)
+
+    async def _acquire(self, site="default"):
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self._record_queue_delay(time.monotonic() - queued_at)
+        metrics.observe("llm_queue_seconds", time.monotonic() - queued_at, site=site)
+        self.calls += 1
+        self.in_flight += 1
+
+    async def _call(self, prompt, timeout, site="default"):
+        tier, profile = self.tier_for(site)
+        timeout = profile.get("timeout", self.timeout) if timeout is None else timeout
+        await self._acquire(site)
+        with metrics.track("llm", site=site, tier=tier):
+            try:
+                loop = asyncio.get_running_loop()
+                response = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        self._executor,
+                        # The model is resolved on the worker thread: building it imports the SDK
+                        lambda: self.model_for(tier).generate_content(
+                            prompt, generation_config=self.generation_config(profile)
+                        ),
+                    ),
+                    timeout=timeout,
+                )
+                text = response.text.strip()
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error(f"Gemini call timed out after {timeout}s")
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+        self._record_usage(site, tier, profile, prompt, response, text)
+        return text
+
+    @staticmethod
+    def _record_usage(site, tier, profile, prompt, response, text):
+        """
+        Count prompt and response tokens, from the SDK's usage metadata when it
+        has it, and their cost at the tier's prices.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+        response_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(text)
+        metrics.inc("llm_prompt_tokens_total", prompt_tokens, site=site, tier=tier)
+        metrics.inc("llm_response_tokens_total", response_tokens, site=site, tier=tier)
+        cost = (prompt_tokens * profile["input_price"] + response_tokens * profile["output_price"]) / 1_000_000
+        metrics.inc("llm_cost_usd_total", cost, tier=tier)
+
+    def _record_queue_delay(self, queue_delay):
+        self.total_queue_delay += queue_delay
+        self.max_queue_delay = max(self.max_queue_delay, queue_delay)
+        if queue_delay > 1.0:
+            logger.warning(
+                f"Gemini call waited {queue_delay:.2f}s for a slot "
+                f"({self.in_flight} in flight, {self.waiting} waiting)"
+            )
+
+    def stats(self):
+        """
+        Return a snapshot of the gateway counters.
+        """
+        return {
+            "cache": self.cache.stats() if self.cache else None,
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "avg_queue_delay": self.total_queue_delay / self.calls if self.calls else 0.0,
+            "max_queue_delay": self.max_queue_delay,
+        }
+
+
+llm_gateway = LLMGateway(cache=LLMCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH))
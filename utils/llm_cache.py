@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt):
+    """
+    Collapse whitespace and case so trivially different phrasings share an entry.
+    """
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class LLMCache:
+    """
+    Prompt-keyed cache of LLM responses.
+
+    Entries live in a bounded in-memory LRU and, when a path is given, in a
+    SQLite file so they survive restarts. Each entry carries its own expiry,
+    which lets every Functionality choose its own TTL.
+    """
+
+    def __init__(self, max_entries=1000, path=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening LLM cache at {path}, using memory only: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(model_name, prompt):
+        return hashlib.sha256(f"{model_name}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, key, namespace="default"):
+        """
+        Return the cached response for the key, or None on a miss.
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._count(self.hits, namespace)
+                return value
+            del self._entries[key]
+
+        if self._db is not None:
+            try:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading LLM cache: {e}")
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                self._count(self.hits, namespace)
+                return row[0]
+
+        self._count(self.misses, namespace)
+        return None
+
+    def set(self, key, value, ttl):
+        """
+        Store a response for `ttl` seconds. A TTL of zero or less is a no-op.
+        """
+        if not ttl or ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing LLM cache: {e}")
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _count(counter, namespace):
+        counter[namespace] = counter.get(namespace, 0) + 1
+
+    def stats(self):
+        """
+        Return hit/miss counters per namespace plus the current in-memory size.
+        """
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            "entries": len(self._entries),
+            "namespaces": {
+                ns: {"hits": self.hits.get(ns, 0), "misses": self.misses.get(ns, 0)}
+                for ns in sorted(namespaces)
+            },
+        }
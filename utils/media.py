@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import threading
+from telegram.error import BadRequest
+from utils.config import MEDIA_CACHE_PATH
+from utils.metrics import metrics
+from utils.outbound import outbound
+
+logger = logging.getLogger(__name__)
+
+
+class MediaRegistry:
+    """
+    Telegram file_id cache for the bot's fixed media assets.
+
+    The first send of an asset passes its URL, so Telegram fetches it once;
+    the file_id in the returned message is stored and every later send
+    reuses it, which is a plain API call with no remote download. The ids
+    are kept in SQLite so they survive restarts and are loaded by every
+    worker process; the file is only opened on the first send, keeping it
+    off the startup path. A file_id Telegram rejects is forgotten and the asset
+    is sent from its URL again, which stores a fresh id.
+    """
+
+    def __init__(self, path=MEDIA_CACHE_PATH):
+        self.path = path
+        self.file_ids = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._opened = False
+
+    def _open(self):
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+            if not self.path:
+                return
+            try:
+                self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS media (kind TEXT, url TEXT, file_id TEXT NOT NULL, "
+                    "PRIMARY KEY (kind, url))"
+                )
+                self._db.commit()
+                self.file_ids = {
+                    (kind, url): file_id
+                    for kind, url, file_id in self._db.execute("SELECT kind, url, file_id FROM media")
+                }
+            except sqlite3.Error as e:
+                logger.error(f"Error opening media cache at {self.path}, using memory only: {e}")
+                self._db = None
+
+    async def send(self, bot, chat_id, kind, url, **kwargs):
+        """
+        Send the asset at `url` as `kind` ('animation', 'photo', 'video', ...)
+        through the outbound dispatcher, using its cached file_id when there is one.
+        """
+        if not self._opened:
+            self._open()
+        method = getattr(bot, f"send_{kind}")
+        key = (kind, url)
+        file_id = self.file_ids.get(key)
+        if file_id is not None:
+            try:
+                message = await outbound.send(chat_id, method, chat_id=chat_id, **{kind: file_id}, **kwargs)
+                metrics.inc("media_sends_total", kind=kind, source="file_id")
+                return message
+            except BadRequest as e:
+                if "file" not in str(e).lower():
+                    raise
+                # Ids are bot-specific and can expire; fall back to the URL below
+                logger.warning(f"Cached file_id for {url} was rejected, sending from URL: {e}")
+                self._forget(key)
+
+        message = await outbound.send(chat_id, method, chat_id=chat_id, **{kind: url}, **kwargs)
+        metrics.inc("media_sends_total", kind=kind, source="url")
+        file_id = self._file_id(message, kind)
+        if file_id is not None:
+            self._remember(key, file_id)
+        return message
+
+    @staticmethod
+    def _file_id(message, kind):
+        # Telegram may file the upload under another type than `kind`
+        attachment = getattr(message, kind, None) or getattr(message, "effective_attachment", None)
+        if isinstance(attachment, (list, tuple)):
+            # Photos come back in several sizes, largest last
+            attachment = attachment[-1] if attachment else None
+        return getattr(attachment, "file_id", None)
+
+    def _remember(self, key, file_id):
+        self.file_ids[key] = file_id
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO media (kind, url, file_id) VALUES (?, ?, ?)", (*key, file_id))
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing media cache: {e}")
+
+    def _forget(self, key):
+        self.file_ids.pop(key, None)
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM media WHERE kind = ? AND url = ?", key)
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing media cache: {e}")
+
+
+media = MediaRegistry()
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits to slow Gemini calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """
+        Estimate a quantile as the upper bound of the bucket that contains it.
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Process-wide registry of counters, gauges and latency histograms.
+
+    Every metric is keyed by name and a dict of labels. Handlers, Gemini calls
+    and Firestore calls are timed with `track`, which also keeps an in-flight
+    gauge and counts errors. `render` produces the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def track(self, name, **labels):
+        """
+        Time the enclosed block as `<name>_seconds`, count it in `<name>_total`
+        and failures in `<name>_errors_total`, and keep `<name>_in_flight` up to date.
+        """
+        self.add_gauge(f"{name}_in_flight", 1, **labels)
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            # Cancellation or an abandoned stream is not a failure of the tracked call
+            if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.add_gauge(f"{name}_in_flight", -1, **labels)
+            self.inc(f"{name}_total", **labels)
+            self.observe(f"{name}_seconds", time.monotonic() - started, **labels)
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.count, h.sum, h.bounds)) for key, h in self.histograms.items()
+            )
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE telebot_{name} {kind}")
+
+        for (name, key), value in counters:
+            declare(name, "counter")
+            lines.append(f"telebot_{name}{_format_labels(key)} {value}")
+        for (name, key), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"telebot_{name}{_format_labels(key)} {value}")
+        for (name, key), (counts, count, total, bounds) in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                lines.append(f"telebot_{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"telebot_{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"telebot_{name}_count{_format_labels(key)} {count}")
+            lines.append(f"telebot_{name}_sum{_format_labels(key)} {total}")
+        lines.append(f"telebot_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Return one line per timed metric with its count, error count and latency quantiles.
+        """
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = dict(self.counters)
+        lines = []
+        for (name, key), histogram in histograms:
+            base = name[:-len("_seconds")] if name.endswith("_seconds") else name
+            errors = counters.get((f"{base}_errors_total", key), 0)
+            labels = ",".join(f"{k}={v}" for k, v in key)
+            lines.append(
+                f"{base}[{labels}] n={histogram.count} errors={errors} "
+                f"avg={histogram.sum / histogram.count * 1000:.0f}ms "
+                f"p50<={histogram.quantile(0.50) * 1000:.0f}ms "
+                f"p95<={histogram.quantile(0.95) * 1000:.0f}ms "
+                f"p99<={histogram.quantile(0.99) * 1000:.0f}ms"
+            )
+        return lines
+
+    async def log_summary(self, context=None):
+        """
+        Job callback: log the summary lines.
+        """
+        lines = self.summary()
+        if lines:
+            logger.info("Metrics summary:\n  " + "\n  ".join(lines))
+
+
+class MetricsServer:
+    """
+    Minimal HTTP listener serving `metrics.render()` on GET /metrics.
+    """
+
+    def __init__(self, registry, host="0.0.0.0", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self, context=None):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+metrics = Metrics()
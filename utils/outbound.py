@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from telegram.error import RetryAfter
+from utils.config import OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @property
+    def full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class OutboundDispatcher:
+    """
+    Central path for every message the bot sends to Telegram.
+
+    Each send takes a token from its chat's bucket and from the global
+    bucket, so fan-outs run concurrently up to Telegram's limits (roughly
+    30 messages per second overall and 1 per second per chat). Sends to the
+    same chat keep their order. A 429 response is retried after the
+    `retry_after` delay Telegram asks for.
+    """
+
+    MAX_IDLE_CHATS = 10000
+
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE,
+                 chat_burst=OUTBOUND_CHAT_BURST, max_retries=OUTBOUND_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats = OrderedDict()
+        self.pending = 0
+        self.sent = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _chat(self, chat_id):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = (asyncio.Lock(), TokenBucket(self.chat_rate, self.chat_burst))
+            self._chats[chat_id] = entry
+            self._prune()
+        self._chats.move_to_end(chat_id)
+        return entry
+
+    def _prune(self):
+        # Forget the least recently used chats once their bucket has refilled
+        while len(self._chats) > self.MAX_IDLE_CHATS:
+            chat_id, (lock, bucket) = next(iter(self._chats.items()))
+            if lock.locked() or not bucket.full:
+                break
+            del self._chats[chat_id]
+
+    async def send(self, chat_id, method, /, *args, **kwargs):
+        """
+        Call a Bot API coroutine function for `chat_id` within the rate limits.
+
+        `chat_id` and `method` are positional-only, so Bot API methods that
+        take their own `chat_id=` keyword can be passed it in `kwargs`.
+        """
+        lock, bucket = self._chat(chat_id)
+        self.pending += 1
+        try:
+            async with lock:
+                for attempt in range(self.max_retries + 1):
+                    await bucket.acquire()
+                    await self.global_bucket.acquire()
+                    try:
+                        result = await method(*args, **kwargs)
+                        self.sent += 1
+                        return result
+                    except RetryAfter as e:
+                        if attempt == self.max_retries:
+                            self.failures += 1
+                            raise
+                        self.retries += 1
+                        delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                        logger.warning(f"Telegram rate limit hit for chat {chat_id}, retrying in {delay}s")
+                        await asyncio.sleep(delay)
+                    except Exception:
+                        self.failures += 1
+                        raise
+        finally:
+            self.pending -= 1
+
+    async def send_message(self, bot, chat_id, text, **kwargs):
+        return await self.send(chat_id, bot.send_message, chat_id=chat_id, text=text, **kwargs)
+
+    async def reply(self, message, text, **kwargs):
+        return await self.send(message.chat_id, message.reply_text, text, **kwargs)
+
+    async def edit(self, message, text, **kwargs):
+        return await self.send(message.chat_id, message.edit_text, text, **kwargs)
+
+    @property
+    def queue_depth(self):
+        return self.pending
+
+    def stats(self):
+        return {
+            "queue_depth": self.pending,
+            "sent": self.sent,
+            "retries": self.retries,
+            "failures": self.failures,
+            "chats": len(self._chats),
+        }
+
+
+outbound = OutboundDispatcher()
@@ -0,0 +1,237 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from utils.dateparse import DATE_PATTERNS, WEEKDAYS, find_time, reminder_content
+
+logger = logging.getLogger(__name__)
+
+# Time of day used when a recurring reminder does not name one, or names only a part of the day
+DEFAULT_TIME = (9, 0)
+PART_OF_DAY_TIMES = {"morning": (8, 0), "afternoon": (14, 0), "evening": (18, 0), "night": (21, 0)}
+PART_OF_DAY = re.compile(r"\b(?P<part>morning|afternoon|evening|night)s?\b", re.I)
+# A part of the day right after the recurrence phrase or the time: 'every monday evening', 'at 7 in the evening'
+PART_OF_DAY_AFTER = re.compile(r"\s*(?:in\s+the\s+)?(?P<part>morning|afternoon|evening|night)s?\b", re.I)
+# A bare hour such as 'at 7', which find_time() leaves alone
+BARE_HOUR = re.compile(r"\bat\s+(?P<hour>[01]?\d|2[0-3])\b(?![:.]\d)(?!\s*[ap]\.?m\b)", re.I)
+
+# Cron field ranges: minute, hour, day of month, month, day of week (0 = Sunday)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+_DAY_NAMES = "|".join(WEEKDAYS)
+_WEEKDAY_LIST = rf"(?P<days>(?:{_DAY_NAMES})s?(?:\s*(?:,|and|&)\s*(?:{_DAY_NAMES})s?)*)"
+# A recurrence phrase must be followed by a time, a clause or the end of the
+# sentence, so adjectives such as 'my daily vitamins' or 'each monday's slides' do not count
+_PHRASE_END = (
+    r"(?=\s+(?:at|to|about|from|around|and|in\s+the|morning|afternoon|evening|night)s?\b"
+    r"|\s*[,.!?;:]|\s*$)"
+)
+
+RECURRENCE_PATTERNS = [
+    ("cron", re.compile(r"\bcron\s*:?\s*(?P<spec>(?:[\d*/,-]+\s+){4}[\d*/,-]+)", re.I)),
+    ("weekdays", re.compile(r"\b(?:every|on)\s+(?:week\s*days?|weekdays)\b" + _PHRASE_END, re.I)),
+    ("weekly", re.compile(rf"\b(?:every|each|weekly\s+on)\s+{_WEEKDAY_LIST}\b" + _PHRASE_END, re.I)),
+    ("monthly", re.compile(
+        r"\b(?:every\s+month|monthly|each\s+month)\s+on\s+(?:the\s+)?(?:day\s+)?(?P<day>\d{1,2})(?:st|nd|rd|th)?\b"
+        r"|\bon\s+the\s+(?P<day2>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?:every|each)\s+month\b",
+        re.I,
+    )),
+    ("daily", re.compile(
+        r"\b(?:every\s*day|daily|each\s+day|every\s+(?:morning|afternoon|evening|night))\b" + _PHRASE_END,
+        re.I,
+    )),
+]
+
+
+def _cron_weekday(python_weekday):
+    return (python_weekday + 1) % 7
+
+
+def parse_recurrence(text):
+    """
+    Parse a recurring reminder such as 'remind me every monday at 9am to stretch'.
+
+    Returns (rule, content) where rule is a five-field cron expression
+    ('minute hour day-of-month month day-of-week'), or None if the text
+    names no recurrence. Daily, weekday, weekly and monthly phrasings are
+    all compiled to cron so one engine computes every next occurrence.
+    A message that also names a one-shot date ('tomorrow', '25 December')
+    is not treated as recurring.
+    """
+    for kind, pattern in RECURRENCE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if kind == "cron":
+            rule = " ".join(groups["spec"].split())
+            if not is_valid(rule):
+                return None
+            content = reminder_content(text, [match.span()])
+            return (rule, content) if content else None
+        if _names_one_shot_date(text):
+            return None
+
+        (hour, minute), spans = _time_of_day(text, match)
+
+        if kind == "daily":
+            rule = f"{minute} {hour} * * *"
+        elif kind == "weekdays":
+            rule = f"{minute} {hour} * * 1-5"
+        elif kind == "weekly":
+            days = re.findall(_DAY_NAMES, groups["days"].lower())
+            rule = f"{minute} {hour} * * " + ",".join(
+                str(d) for d in sorted({_cron_weekday(WEEKDAYS[day]) for day in days})
+            )
+        else:
+            day = int(groups["day"] or groups["day2"])
+            if not 1 <= day <= 31:
+                return None
+            rule = f"{minute} {hour} {day} * *"
+
+        content = reminder_content(text, [match.span(), *spans])
+        return (rule, content) if content else None
+    return None
+
+
+def _names_one_shot_date(text):
+    # Weekday names are left out: 'every monday' names one too
+    return any(pattern.search(text) for kind, pattern in DATE_PATTERNS if kind != "weekday")
+
+
+def _time_of_day(text, match):
+    """
+    Return ((hour, minute), spans) for the recurrence `match` in `text`, where
+    spans cover the time phrases to drop from the reminder text.
+
+    A bare 'at 7' is read in the named part of the day ('every evening at 7'
+    is 19:00), and a part of the day alone gets its default time. Only a part
+    of the day inside or right after the recurrence phrase or the time counts,
+    so 'say good morning to the team' is left alone.
+    """
+    spans = []
+    part = PART_OF_DAY.search(match.group(0))
+    if part is None:
+        part = PART_OF_DAY_AFTER.match(text, match.end())
+        if part is not None:
+            spans.append(part.span())
+    time_value, time_span, is_relative = find_time(text)
+    if time_value is not None and not is_relative:
+        return time_value, spans + [time_span]
+    bare = BARE_HOUR.search(text)
+    if bare:
+        spans.append(bare.span())
+        if part is None:
+            part = PART_OF_DAY_AFTER.match(text, bare.end())
+            if part is not None:
+                spans.append(part.span())
+    part = part.group("part").lower() if part is not None else None
+    if bare:
+        hour = int(bare.group("hour"))
+        if (part in ("afternoon", "evening") and hour < 12) or (part == "night" and 6 <= hour < 12):
+            hour += 12
+        return (hour, 0), spans
+    return PART_OF_DAY_TIMES.get(part, DEFAULT_TIME), spans
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"invalid step: {step}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"value out of range: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def compile_rule(rule):
+    """
+    Parse a cron expression into (minutes, hours, days, months, weekdays, dom_any, dow_any).
+    """
+    fields = rule.split()
+    if len(fields) != 5:
+        raise ValueError(f"expected 5 fields: {rule!r}")
+    # Day of week 7 is another name for Sunday
+    fields[4] = re.sub(r"\b7\b", "0", fields[4])
+    sets = [_parse_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)]
+    return (*sets, fields[2] == "*", fields[4] == "*")
+
+
+def is_valid(rule):
+    try:
+        compile_rule(rule)
+        return True
+    except ValueError:
+        return False
+
+
+def next_fire(rule, after):
+    """
+    Return the first datetime strictly after `after` matching the cron rule.
+
+    Whole months and days that cannot match are skipped, so a rule is
+    evaluated in a handful of steps. As in cron, when both day of month and
+    day of week are restricted, a day matching either fires. Returns None
+    if nothing matches in the next five years (e.g. '0 9 31 2 *').
+    """
+    minutes, hours, days, months, weekdays, dom_any, dow_any = compile_rule(rule)
+    candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=5 * 366)
+    while candidate <= limit:
+        if candidate.month not in months:
+            year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+            candidate = datetime(year, month, 1)
+            continue
+
+        dom_match = candidate.day in days
+        dow_match = _cron_weekday(candidate.weekday()) in weekdays
+        if dom_any and dow_any:
+            day_matches = True
+        elif dom_any:
+            day_matches = dow_match
+        elif dow_any:
+            day_matches = dom_match
+        else:
+            day_matches = dom_match or dow_match
+        if not day_matches:
+            candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+            continue
+
+        for hour in sorted(h for h in hours if h >= candidate.hour):
+            first_minute = candidate.minute if hour == candidate.hour else 0
+            minute = min((m for m in minutes if m >= first_minute), default=None)
+            if minute is not None:
+                return candidate.replace(hour=hour, minute=minute)
+        candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+    return None
+
+
+def describe(rule):
+    """
+    Render a rule produced by parse_recurrence in words, or the raw cron expression.
+    """
+    minute, hour, dom, month, dow = rule.split()
+    if not (minute.isdigit() and hour.isdigit()) or month != "*":
+        return f"cron {rule}"
+    at = datetime(2000, 1, 1, int(hour), int(minute)).strftime("%I:%M %p")
+    if dom == "*" and dow == "*":
+        return f"every day at {at}"
+    if dom == "*" and dow == "1-5":
+        return f"every weekday at {at}"
+    if dom == "*" and re.fullmatch(r"[0-6](?:,[0-6])*", dow):
+        names = [datetime(2000, 1, 2 + int(d)).strftime("%A") for d in dow.split(",")]
+        return f"every {', '.join(names)} at {at}"
+    if dow == "*" and dom.isdigit():
+        return f"monthly on day {dom} at {at}"
+    return f"cron {rule}"
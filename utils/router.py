@@ -0,0 +1,157 @@
+import logging
+import re
+import time
+from collections import deque
+from utils.lanes import lanes, BUSY_TEXT
+from utils.outbound import outbound
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over whole-word keywords.
+
+    Finds every keyword occurring in a text in a single pass, whatever the
+    number of keywords.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for value, keyword in keywords:
+            self._insert(keyword.lower(), value)
+        self._build()
+
+    def _insert(self, keyword, value):
+        state = 0
+        for char in keyword:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append((len(keyword), value))
+
+    def _build(self):
+        # Depth-one states fail back to the root; deeper ones are filled breadth first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """
+        Yield the value of every keyword found in the text as a whole word.
+        """
+        text = text.lower()
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                start = end - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    yield value
+
+
+class IntentRouter:
+    """
+    Routes messages to Functionalities by their registered keywords and patterns.
+
+    Each Functionality declares `keywords`, `patterns` and a `priority`. Keywords
+    are compiled into one Aho-Corasick automaton and patterns into one
+    alternation regex, so routing is a single pass over the text. When several
+    routes match, the highest priority wins; ties go to the one registered first.
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+        self.routes = []
+        self.stats = {}
+        self._matcher = None
+        self._pattern = None
+        self._pattern_routes = {}
+
+    def register(self, functionality):
+        """
+        Add a Functionality using its `keywords`, `patterns` and `priority` attributes.
+        """
+        self.routes.append(functionality)
+        self._matcher = None
+        return functionality
+
+    def compile(self):
+        keywords = []
+        alternatives = []
+        self._pattern_routes = {}
+        for order, functionality in enumerate(self.routes):
+            for keyword in functionality.keywords:
+                keywords.append(((functionality.priority, -order), keyword))
+            for pattern in functionality.patterns:
+                # Patterns may carry their own priority as (regex, priority)
+                regex, priority = pattern if isinstance(pattern, tuple) else (pattern, functionality.priority)
+                group = f"p{len(alternatives)}"
+                alternatives.append(f"(?P<{group}>{regex})")
+                self._pattern_routes[group] = (priority, -order)
+        self._matcher = KeywordMatcher(keywords)
+        self._pattern = re.compile("|".join(alternatives), re.I) if alternatives else None
+
+    def route(self, text):
+        """
+        Return the Functionality that should handle the text.
+        """
+        if self._matcher is None:
+            self.compile()
+        best = None
+        for rank in self._matcher.find(text):
+            best = max(best, rank) if best else rank
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                rank = self._pattern_routes[match.lastgroup]
+                best = max(best, rank) if best else rank
+        if best is None:
+            return self.default
+        return self.routes[-best[1]]
+
+    async def dispatch(self, update, context):
+        """
+        Message handler: route the update and queue it on its Functionality's lane.
+
+        Returns as soon as the update is queued, so a backlog in one lane
+        never holds up updates bound for another.
+        """
+        text = update.message.text or ""
+        functionality = self.route(text)
+        if functionality is None:
+            return
+        lane = functionality.lane_for(text)
+        if not lanes.submit(lane, update.message.chat_id, self._execute, functionality, update, context):
+            logger.warning(f"The {lane} lane is full, turning away a message")
+            await outbound.reply(update.message, BUSY_TEXT)
+
+    async def _execute(self, functionality, update, context):
+        """
+        Run the Functionality and record per-route stats.
+        """
+        name = type(functionality).__name__
+        logger.debug(f"Routing message to {name}")
+        stats = self.stats.setdefault(name, {"count": 0, "errors": 0, "total_time": 0.0})
+        stats["count"] += 1
+        started = time.monotonic()
+        try:
+            await functionality.execute(update, context)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["total_time"] += time.monotonic() - started
@@ -0,0 +1,205 @@
+import asyncio
+import heapq
+import logging
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+from utils.recurrence import next_fire
+from utils.workers import SINGLE
+
+logger = logging.getLogger(__name__)
+
+# `rule` is a cron expression for recurring reminders and None for one-shot ones
+Reminder = namedtuple("Reminder", ["id", "chat_id", "fire_at", "text", "rule"])
+
+# Delay before retrying a reminder whose send failed, doubled per failure up to the cap
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+# Consecutive failed sends after which a reminder is dropped
+MAX_ATTEMPTS = 10
+
+
+class ReminderScheduler:
+    """
+    Process-wide reminder scheduler.
+
+    Pending reminders are compact records kept in a min-heap ordered by fire
+    time and persisted in SQLite, so they survive restarts. A single job on the
+    bot's JobQueue is armed for the earliest entry; when it runs, every due
+    reminder is fired in batches and the job is re-armed for the next one.
+    A recurring reminder keeps a single entry: after it fires, its next
+    occurrence is computed from its rule and the entry is pushed back.
+    With several worker processes sharing the SQLite file, each one only
+    loads and fires the reminders of the chats in its `shard`. A reminder
+    whose `on_fire` fails is kept and retried with exponential backoff, up to
+    MAX_ATTEMPTS times in a row; it is dropped at once if `is_permanent`
+    returns True for the error, e.g. when the bot was blocked in the chat.
+    """
+
+    JOB_NAME = "reminder-scheduler"
+
+    def __init__(self, path, on_fire, batch_size=100, shard=SINGLE, is_permanent=None):
+        self.on_fire = on_fire
+        self.is_permanent = is_permanent or (lambda error: False)
+        self.shard = shard
+        self.batch_size = batch_size
+        self.entries = {}
+        self.failures = {}
+        self._heap = []
+        self._job_queue = None
+        self._job = None
+        self._armed_at = None
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reminders ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "chat_id INTEGER NOT NULL, "
+            "fire_at REAL NOT NULL, "
+            "text TEXT NOT NULL, "
+            "rule TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(reminders)")}
+        if "rule" not in columns:
+            self._db.execute("ALTER TABLE reminders ADD COLUMN rule TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reminders_fire_at ON reminders (fire_at)")
+        self._db.commit()
+
+    def start(self, job_queue):
+        """
+        Load pending reminders from disk and arm the timer on the given JobQueue.
+        """
+        self._job_queue = job_queue
+        for row in self._db.execute("SELECT id, chat_id, fire_at, text, rule FROM reminders"):
+            reminder = Reminder(*row)
+            if not self.shard.owns(reminder.chat_id):
+                continue
+            self.entries[reminder.id] = reminder
+            self._heap.append((reminder.fire_at, reminder.id))
+        heapq.heapify(self._heap)
+        logger.info(f"Loaded {len(self.entries)} pending reminders")
+        self._arm()
+
+    def add(self, chat_id, fire_at, text, rule=None):
+        """
+        Persist a reminder and schedule it. `fire_at` is a datetime; `rule`
+        makes the reminder recur after its first occurrence.
+        """
+        timestamp = fire_at.timestamp()
+        cursor = self._db.execute(
+            "INSERT INTO reminders (chat_id, fire_at, text, rule) VALUES (?, ?, ?, ?)",
+            (chat_id, timestamp, text, rule),
+        )
+        self._db.commit()
+        reminder = Reminder(cursor.lastrowid, chat_id, timestamp, text, rule)
+        self.entries[reminder.id] = reminder
+        heapq.heappush(self._heap, (timestamp, reminder.id))
+        if self._armed_at is None or timestamp < self._armed_at:
+            self._arm()
+        return reminder
+
+    def for_chat(self, chat_id):
+        """
+        Return the chat's pending reminders, soonest first.
+        """
+        return sorted((r for r in self.entries.values() if r.chat_id == chat_id), key=lambda r: r.fire_at)
+
+    def cancel(self, reminder_id):
+        """
+        Remove a pending reminder. Its heap slot is skipped lazily when it comes due.
+        """
+        reminder = self.entries.pop(reminder_id, None)
+        if reminder is None:
+            return False
+        self.failures.pop(reminder_id, None)
+        self._db.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+        self._db.commit()
+        return True
+
+    def _arm(self):
+        if self._job_queue is None:
+            return
+        # Drop cancelled entries from the top of the heap
+        while self._heap and self._heap[0][1] not in self.entries:
+            heapq.heappop(self._heap)
+
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+            self._armed_at = None
+        if not self._heap:
+            return
+
+        fire_at = self._heap[0][0]
+        self._armed_at = fire_at
+        self._job = self._job_queue.run_once(
+            self._fire_due, when=max(0.0, fire_at - time.time()), name=self.JOB_NAME
+        )
+
+    async def _fire_due(self, context):
+        self._job = None
+        self._armed_at = None
+        try:
+            while True:
+                now = time.time()
+                batch = []
+                while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                    _, reminder_id = heapq.heappop(self._heap)
+                    reminder = self.entries.pop(reminder_id, None)
+                    if reminder is not None:
+                        batch.append(reminder)
+                if not batch:
+                    break
+
+                results = await asyncio.gather(
+                    *(self.on_fire(reminder, context) for reminder in batch), return_exceptions=True
+                )
+                failed = {}
+                for reminder, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error sending reminder {reminder.id}: {result}")
+                        failed[reminder.id] = result
+                self._reschedule(batch, failed)
+                self._db.commit()
+        finally:
+            self._arm()
+
+    def _reschedule(self, fired, failed=None):
+        """
+        Delete fired one-shot reminders and move recurring ones to their next
+        occurrence. Reminders in `failed`, a dict of errors by id, are re-armed
+        after a backoff instead, or at their next occurrence if that comes
+        first; ones that cannot be delivered are deleted.
+        """
+        failed = failed or {}
+        done = []
+        for reminder in fired:
+            following = next_fire(reminder.rule, datetime.now()) if reminder.rule else None
+            if reminder.id in failed:
+                attempts = self.failures.get(reminder.id, 0) + 1
+                if self.is_permanent(failed[reminder.id]) or attempts >= MAX_ATTEMPTS:
+                    logger.warning(
+                        f"Dropping reminder {reminder.id} for chat {reminder.chat_id} "
+                        f"after {attempts} failed attempts: {failed[reminder.id]}"
+                    )
+                    self.failures.pop(reminder.id, None)
+                    done.append((reminder.id,))
+                    continue
+                self.failures[reminder.id] = attempts
+                timestamp = time.time() + min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+                if following is not None:
+                    timestamp = min(timestamp, following.timestamp())
+                logger.warning(f"Retrying reminder {reminder.id} in {timestamp - time.time():.0f}s (attempt {attempts})")
+            elif following is None:
+                self.failures.pop(reminder.id, None)
+                done.append((reminder.id,))
+                continue
+            else:
+                self.failures.pop(reminder.id, None)
+                timestamp = following.timestamp()
+            self._db.execute("UPDATE reminders SET fire_at = ? WHERE id = ?", (timestamp, reminder.id))
+            reminder = reminder._replace(fire_at=timestamp)
+            self.entries[reminder.id] = reminder
+            heapq.heappush(self._heap, (timestamp, reminder.id))
+        self._db.executemany("DELETE FROM reminders WHERE id = ?", done)
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """
+    Records how long each import and component initialization takes during startup.
+
+    Slow work (the Gemini SDK, the Firestore client and the birthday cache) is
+    deferred to a warm-up job that runs in a thread once the bot is serving,
+    and its timings are added to the same report.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = []
+
+    @contextmanager
+    def timed(self, kind, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings.append((kind, name, elapsed))
+            metrics.add_gauge("startup_seconds", elapsed, kind=kind, component=name)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def log(self, title):
+        lines = [f"{kind:<8} {name:<24} {seconds * 1000:8.1f}ms" for kind, name, seconds in self.timings]
+        logger.info(f"{title} after {self.elapsed:.2f}s:\n  " + "\n  ".join(lines))
+
+    def warm_up_job(self, components):
+        """
+        Return a job callback that initializes each (name, function) pair in a
+        worker thread, so the event loop keeps serving updates meanwhile.
+        """
+        async def warm_up(context=None):
+            self.log("Serving updates")
+            for name, initialize in components:
+                try:
+                    with self.timed("warm-up", name):
+                        await asyncio.to_thread(initialize)
+                except Exception as e:
+                    logger.error(f"Error warming up {name}: {e}")
+            self.log("Warm-up finished")
+
+        return warm_up
+
+
+startup = StartupReport()
@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+class Shard(namedtuple("Shard", ["index", "count"])):
+    """
+    The slice of chats a worker process owns: chat_id modulo the worker count.
+
+    Every update, reminder and birthday notification for a chat is handled by
+    the same worker, which keeps per-chat ordering and per-chat state local.
+    """
+
+    __slots__ = ()
+
+    def owns(self, chat_id):
+        return self.count <= 1 or shard_for(chat_id, self.count) == self.index
+
+
+SINGLE = Shard(0, 1)
+
+
+def shard_for(chat_id, count):
+    return chat_id % count if chat_id is not None else 0
+
+
+class WorkerPool:
+    """
+    Runs `count` worker processes and forwards each update to the one that owns its chat.
+
+    The front process keeps polling (or serving the webhook) and only
+    serializes updates onto one queue per worker; the workers run the
+    handlers. Queues are FIFO, so updates of a chat reach its worker in order.
+    """
+
+    def __init__(self, count, target):
+        # Spawned rather than forked: the telegram and SDK clients do not survive a fork
+        context = multiprocessing.get_context("spawn")
+        self.count = count
+        self.queues = [context.Queue() for _ in range(count)]
+        self.processes = [
+            context.Process(target=target, args=(Shard(index, count), queue), name=f"worker-{index}", daemon=True)
+            for index, queue in enumerate(self.queues)
+        ]
+        self.forwarded = [0] * count
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        logger.info(f"Started {self.count} worker processes")
+
+    def stop(self, timeout=10):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    async def forward(self, update, context):
+        """
+        Update handler for the front process: hand the update to its chat's worker.
+        """
+        chat = update.effective_chat
+        index = shard_for(chat.id if chat else None, self.count)
+        self.queues[index].put(update.to_dict())
+        self.forwarded[index] += 1